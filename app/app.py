@@ -1,38 +1,140 @@
 # app/app.py
 
+import copy
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 from datetime import date, timedelta
-import altair as alt
 
 
 from queries import (
     get_user_id_by_username,
     insert_workout,
     get_weekly_volume_by_sport,
-    get_total_distance_per_gear,
-    fetch_workouts,              
-    fetch_run_workouts_view,     
-    fetch_bike_workouts_view,    
-    fetch_swim_workouts_view,
+    fetch_workouts,
+    fetch_sport_view,
     insert_gear,
-    attach_gear_to_workout,    
-    get_total_distance_per_gear,
+    get_gear_distance_display,
     list_users
 )
+from parsing import parse_start_time
+
+# ---------- Chart specs ----------
+# Raw Vega-Lite specs for the dashboard charts, built once at import time.
+# Each render deep-copies one and patches the y-axis upper bound; this skips
+# Altair's per-rerun spec construction and validation.
+
+_DIST_SPEC = {
+    "mark": {"type": "line", "point": True},
+    "encoding": {
+        "x": {"field": "week_start", "type": "temporal", "title": "Week starting"},
+        "y": {
+            "field": "total_distance_km",
+            "type": "quantitative",
+            "title": "Distance (km)",
+            "scale": {"domain": [0, 0]},
+        },
+        "color": {"field": "workout_type", "type": "nominal", "title": "Sport"},
+        "tooltip": [
+            {"field": "week_start", "type": "temporal", "title": "Week"},
+            {"field": "workout_type", "type": "nominal", "title": "Sport"},
+            {
+                "field": "total_distance_km",
+                "type": "quantitative",
+                "title": "Distance (km)",
+                "format": ".1f",
+            },
+            {"field": "total_duration_min", "type": "quantitative", "title": "Duration (min)"},
+        ],
+    },
+    "height": 350,
+}
+
+_TIME_SPEC = {
+    "mark": {"type": "line", "point": True},
+    "encoding": {
+        "x": {"field": "week_start", "type": "temporal", "title": "Week starting"},
+        "y": {
+            "field": "total_duration_hours",
+            "type": "quantitative",
+            "title": "Duration (hours)",
+            "scale": {"domain": [0, 0]},
+        },
+        "color": {"field": "workout_type", "type": "nominal", "title": "Sport"},
+        "tooltip": [
+            {"field": "week_start", "type": "temporal", "title": "Week"},
+            {"field": "workout_type", "type": "nominal", "title": "Sport"},
+            {
+                "field": "total_duration_hours",
+                "type": "quantitative",
+                "title": "Duration (h)",
+                "format": ".2f",
+            },
+            {"field": "total_duration_min", "type": "quantitative", "title": "Duration (min)"},
+        ],
+    },
+    "height": 350,
+}
+
+
+# ---------- Cached query wrappers ----------
+# Streamlit reruns the whole script on every widget interaction, so the
+# read-only queries are memoized for a short TTL to avoid hitting Postgres
+# on every checkbox toggle.
+
+@st.cache_resource(ttl=300)
+def _cached_users() -> dict[str, int]:
+    # users: list of (user_id, username) -> {username: user_id}
+    return {username: uid for uid, username in list_users()}
+
+
+@st.cache_data(ttl=60, max_entries=128)
+def _cached_weekly_volume(user_id: int, start_date: date, end_date: date):
+    return get_weekly_volume_by_sport(user_id, start_date, end_date)
 
-def format_pace(seconds: float | int | None) -> str:
-    if seconds is None:
-        return ""
-    try:
-        s = int(seconds)
-    except (TypeError, ValueError):
-        return ""
-    minutes = s // 60
-    sec = s % 60
-    return f"{minutes}:{sec:02d}"
+
+@st.cache_data(ttl=60, max_entries=128)
+def _cached_workouts(user_id: int, start_date: date, end_date: date):
+    return fetch_workouts(
+        user_id=user_id,
+        workout_type_name=None,
+        start_date=start_date,
+        end_date=end_date,
+    )
+
+
+@st.cache_data(ttl=60, max_entries=128)
+def _cached_sport_workouts(sport: str, user_id: int, start_date: date, end_date: date):
+    return fetch_sport_view(sport, user_id, start_date, end_date)
 
 
+@st.cache_data(ttl=30, max_entries=128)
+def _cached_gear(user_id: int):
+    # Shared by the Add Workout and Gear pages: one query per interaction
+    return get_gear_distance_display(user_id)
+
+
+def _clear_query_caches():
+    """Drop cached query results after a write so the next rerun sees it."""
+    st.cache_data.clear()
+
+
+def format_pace_series(seconds: pd.Series) -> pd.Series:
+    """Format a column of pace seconds as M:SS; missing values become ""."""
+    secs = pd.to_numeric(seconds, errors="coerce").to_numpy(dtype=np.float64)
+    missing = np.isnan(secs)
+    # Plain int64 arithmetic (NaNs zeroed, then masked) instead of the
+    # nullable Int64 path
+    minutes, sec = np.divmod(np.where(missing, 0.0, secs).astype(np.int64), 60)
+    pace = (
+        pd.Series(minutes, index=seconds.index).astype(str)
+        + ":"
+        + pd.Series(sec, index=seconds.index).astype(str).str.zfill(2)
+    )
+    pace[missing] = ""
+    return pace
+
 
 def main():
     st.set_page_config(page_title="IronTrack", layout="wide")
@@ -41,14 +143,12 @@ def main():
     # Sidebar: choose user from DB
     st.sidebar.header("User")
 
-    users = list_users()
-    if not users:
+    username_to_id = _cached_users()
+    if not username_to_id:
         st.sidebar.error("No users found in the database. Seed or create a user first.")
         st.write("No users in the database. Run seed_demo.py or insert a user manually.")
         return
 
-    # users: list of (user_id, username)
-    username_to_id = {u[1]: u[0] for u in users}
     usernames = list(username_to_id.keys())
 
     selected_username = st.sidebar.selectbox(
@@ -96,7 +196,14 @@ def render_dashboard(user_id: int):
         st.error("Start date must be before end date.")
         return
 
-    rows = get_weekly_volume_by_sport(user_id, start_date, end_date)
+    # Totals come in whole Monday-Sunday weeks, so widen the range to match
+    start_date -= timedelta(days=start_date.weekday())
+    end_date += timedelta(days=6 - end_date.weekday())
+    st.caption(
+        f"Totals cover whole weeks: Mon {start_date:%Y-%m-%d} – Sun {end_date:%Y-%m-%d}"
+    )
+
+    rows = _cached_weekly_volume(user_id, start_date, end_date)
     if not rows:
         st.info("No workouts in this date range.")
         return
@@ -107,22 +214,27 @@ def render_dashboard(user_id: int):
             "week_start",
             "workout_type",
             "total_distance_km",
-            "total_duration_sec",
+            "total_duration_min",
+            "total_duration_hours",
         ],
     )
 
-    # Ensure types are correct for Altair
+    # Ensure types are correct for the charts
+    # (SQL already returns float8 distance/hours and integer minutes, never NULL)
     df["week_start"] = pd.to_datetime(df["week_start"])
-    df["total_distance_km"] = pd.to_numeric(df["total_distance_km"], errors="coerce")
-    df["total_duration_sec"] = pd.to_numeric(df["total_duration_sec"], errors="coerce")
-    df["total_duration_min"] = (df["total_duration_sec"] // 60).astype("Int64")
-    df["total_duration_hours"] = df["total_duration_min"] / 60.0
+    df["total_distance_km"] = df["total_distance_km"].astype(np.float64, copy=False)
+    df["workout_type"] = df["workout_type"].astype("category")
 
-    df = df.dropna(subset=["total_distance_km"])
+    _render_dashboard_charts(df)
 
-    # Sport filter
-        # Sport filter (checkboxes instead of dropdown)
-    all_sports = sorted(df["workout_type"].unique())
+
+@st.fragment
+def _render_dashboard_charts(df: pd.DataFrame):
+    # Runs as a fragment so toggling a sport checkbox only reruns this part,
+    # not the date inputs and the weekly-volume query above.
+
+    # Sport filter (checkboxes instead of dropdown)
+    all_sports = list(df["workout_type"].cat.categories)  # already sorted
 
     st.markdown("**Sports to show**")
     sport_cols = st.columns(len(all_sports))
@@ -142,35 +254,27 @@ def render_dashboard(user_id: int):
         st.info("Select at least one sport to display.")
         return
 
-    df_filtered = df[df["workout_type"].isin(selected_sports)]
-    if df_filtered.empty:
-        st.info("No workouts for the selected sports in this date range.")
-        return
-
-
-    if not selected_sports:
-        st.info("Select at least one sport to display.")
-        return
-
-    df_filtered = df[df["workout_type"].isin(selected_sports)]
+    # Compare integer category codes rather than strings
+    selected_codes = df["workout_type"].cat.categories.get_indexer(selected_sports)
+    df_filtered = df[np.isin(df["workout_type"].cat.codes.to_numpy(), selected_codes)]
     if df_filtered.empty:
         st.info("No workouts for the selected sports in this date range.")
         return
 
     # Summary cards: total distance per selected sport
     summary = (
-        df_filtered.groupby("workout_type")["total_distance_km"]
+        df_filtered.groupby("workout_type", observed=True)["total_distance_km"]
         .sum()
         .reset_index()
         .sort_values("workout_type")
     )
     st.subheader("Total Distance by Sport")
     cols = st.columns(len(summary))
-    for col, (_, row) in zip(cols, summary.iterrows()):
+    for col, (sport, dist) in zip(cols, summary.itertuples(index=False, name=None)):
         with col:
             st.metric(
-                label=row["workout_type"].capitalize(),
-                value=f"{row['total_distance_km']:.1f} km",
+                label=sport.capitalize(),
+                value=f"{dist:.1f} km",
             )
 
     # Side-by-side charts 
@@ -186,32 +290,9 @@ def render_dashboard(user_id: int):
         else:
             y_max_dist = max(1.0, float(max_dist) * 1.1)
 
-            distance_chart = (
-                alt.Chart(df_filtered)
-                .mark_line(point=True)
-                .encode(
-                    x=alt.X("week_start:T", title="Week starting"),
-                    y=alt.Y(
-                        "total_distance_km:Q",
-                        title="Distance (km)",
-                        scale=alt.Scale(domain=[0, y_max_dist]),
-                    ),
-                    color=alt.Color("workout_type:N", title="Sport"),
-                    tooltip=[
-                        alt.Tooltip("week_start:T", title="Week"),
-                        alt.Tooltip("workout_type:N", title="Sport"),
-                        alt.Tooltip(
-                            "total_distance_km:Q", title="Distance (km)", format=".1f"
-                        ),
-                        alt.Tooltip(
-                            "total_duration_min:Q", title="Duration (min)"
-                        ),
-                    ],
-                )
-                .properties(height=350)
-            )
-
-            st.altair_chart(distance_chart, width="stretch")
+            spec = copy.deepcopy(_DIST_SPEC)
+            spec["encoding"]["y"]["scale"]["domain"][1] = y_max_dist
+            st.vega_lite_chart(df_filtered, spec, width="stretch")
 
     # Right: Weekly Time 
     with right_col:
@@ -223,32 +304,9 @@ def render_dashboard(user_id: int):
         else:
             y_max_hours = max(0.5, float(max_hours) * 1.1)
 
-            time_chart = (
-                alt.Chart(df_filtered)
-                .mark_line(point=True)
-                .encode(
-                    x=alt.X("week_start:T", title="Week starting"),
-                    y=alt.Y(
-                        "total_duration_hours:Q",
-                        title="Duration (hours)",
-                        scale=alt.Scale(domain=[0, y_max_hours]),
-                    ),
-                    color=alt.Color("workout_type:N", title="Sport"),
-                    tooltip=[
-                        alt.Tooltip("week_start:T", title="Week"),
-                        alt.Tooltip("workout_type:N", title="Sport"),
-                        alt.Tooltip(
-                            "total_duration_hours:Q", title="Duration (h)", format=".2f"
-                        ),
-                        alt.Tooltip(
-                            "total_duration_min:Q", title="Duration (min)"
-                        ),
-                    ],
-                )
-                .properties(height=350)
-            )
-
-            st.altair_chart(time_chart, width="stretch")
+            spec = copy.deepcopy(_TIME_SPEC)
+            spec["encoding"]["y"]["scale"]["domain"][1] = y_max_hours
+            st.vega_lite_chart(df_filtered, spec, width="stretch")
 
 
 # View Workouts
@@ -256,210 +314,112 @@ def render_dashboard(user_id: int):
 def render_view_workouts(user_id: int):
     st.header("View Workouts")
 
-    # Filter controls
+    # Optional date range filter
+    today = date.today()
+    start_default = today.replace(month=10, day=1) if today.year == 2025 else today - timedelta(weeks=8)
+
     col1, col2 = st.columns(2)
     with col1:
-        workout_scope = st.radio(
-            "Workout type",
-            options=["All", "Run", "Bike", "Swim"],
-            horizontal=True,
-        )
-    with col2:
-        # Optional date range filter
-        today = date.today()
-        start_default = today.replace(month=10, day=1) if today.year == 2025 else today - timedelta(weeks=8)
         start_date = st.date_input("Start date", value=start_default)
+    with col2:
         end_date = st.date_input("End date", value=today)
 
     if start_date > end_date:
         st.error("Start date must be before end date.")
         return
 
+    _render_workout_table(user_id, start_date, end_date)
+
+
+@st.fragment
+def _render_workout_table(user_id: int, start_date: date, end_date: date):
+    # Fragment: switching the workout type only reruns the table below.
+    workout_scope = st.radio(
+        "Workout type",
+        options=["All", "Run", "Bike", "Swim"],
+        horizontal=True,
+    )
+
     # Query based on selected scope
     if workout_scope == "All":
         # Base workouts table via existing fetch_workouts()
-        rows = fetch_workouts(
-            user_id=user_id,
-            workout_type_name=None,
-            start_date=start_date,
-            end_date=end_date,
-        )
-        if not rows:
+        cols = _cached_workouts(user_id, start_date, end_date)
+        if not cols:
             st.info("No workouts found for this range.")
             return
 
-        df = pd.DataFrame(
-            rows,
-            columns=[
-                "workout_id",
-                "workout_date",
-                "start_time",
-                "workout_type",
-                "distance_km",
-                "duration_seconds",
-                "effort_level",
-                "notes",
-            ],
-        )
-        df["duration_min"] = (df["duration_seconds"] // 60).astype(int)
+        df = pd.DataFrame(cols)
 
         st.subheader("All Workouts (base table)")
-        st.dataframe(
-            df[
-                [
-                    "workout_date",
-                    "start_time",
-                    "workout_type",
-                    "distance_km",
-                    "duration_min",
-                    "effort_level",
-                    "notes",
-                ]
-            ],
-            width="stretch",
-        )
+        st.dataframe(df, width="stretch")
 
     elif workout_scope == "Run":
-        rows = fetch_run_workouts_view(user_id, start_date, end_date)
-        if not rows:
+        cols = _cached_sport_workouts("run", user_id, start_date, end_date)
+        if not cols:
             st.info("No run workouts found for this range.")
             return
 
-        df = pd.DataFrame(
-            rows,
-            columns=[
-                "workout_id",
-                "workout_date",
-                "start_time",
-                "distance_miles",
-                "duration_seconds",
-                "pace_seconds_per_mile",
-                "elevation_gain_m",
-                "calories_kcal",
-                "avg_heart_rate_bpm",
-                "avg_cadence_spm",
-                "effort_level",
-                "notes",
-            ],
+        df = pd.DataFrame(cols).rename(
+            columns={"pace_seconds_per_mile": "pace_min_per_mile"}
         )
-        df["duration_min"] = (df["duration_seconds"] // 60).astype(int)
-        df["pace_min_per_mile"] = df["pace_seconds_per_mile"].apply(format_pace)
+        df["pace_min_per_mile"] = format_pace_series(df["pace_min_per_mile"])
 
         st.subheader("Run Workouts (run_workouts view)")
-        st.dataframe(
-            df[
-                [
-                    "workout_date",
-                    "start_time",
-                    "distance_miles",
-                    "duration_min",
-                    "pace_min_per_mile",
-                    "elevation_gain_m",
-                    "avg_heart_rate_bpm",
-                    "avg_cadence_spm",
-                    "effort_level",
-                    "notes",
-                ]
-            ],
-            width="stretch",
-        )
+        st.dataframe(df, width="stretch")
 
     elif workout_scope == "Bike":
-        rows = fetch_bike_workouts_view(user_id, start_date, end_date)
-        if not rows:
+        cols = _cached_sport_workouts("bike", user_id, start_date, end_date)
+        if not cols:
             st.info("No bike workouts found for this range.")
             return
 
-        df = pd.DataFrame(
-            rows,
-            columns=[
-                "workout_id",
-                "workout_date",
-                "start_time",
-                "distance_miles",
-                "duration_seconds",
-                "speed_mph",
-                "elevation_gain_m",
-                "calories_kcal",
-                "avg_heart_rate_bpm",
-                "avg_cadence_rpm",
-                "avg_power_w",
-                "effort_level",
-                "notes",
-            ],
-        )
-        df["duration_min"] = (df["duration_seconds"] // 60).astype(int)
+        df = pd.DataFrame(cols)
 
         st.subheader("Bike Workouts (bike_workouts view)")
-        st.dataframe(
-            df[
-                [
-                    "workout_date",
-                    "start_time",
-                    "distance_miles",
-                    "duration_min",
-                    "speed_mph",
-                    "elevation_gain_m",
-                    "avg_heart_rate_bpm",
-                    "avg_cadence_rpm",
-                    "avg_power_w",
-                    "effort_level",
-                    "notes",
-                ]
-            ],
-            width="stretch",
-        )
+        st.dataframe(df, width="stretch")
 
     else:  # Swim
-        rows = fetch_swim_workouts_view(user_id, start_date, end_date)
-        if not rows:
+        cols = _cached_sport_workouts("swim", user_id, start_date, end_date)
+        if not cols:
             st.info("No swim workouts found for this range.")
             return
 
-        df = pd.DataFrame(
-            rows,
-            columns=[
-                "workout_id",
-                "workout_date",
-                "start_time",
-                "distance_yards",
-                "duration_seconds",
-                "pace_seconds_per_100yd",
-                "calories_kcal",
-                "avg_heart_rate_bpm",
-                "effort_level",
-                "notes",
-            ],
+        df = pd.DataFrame(cols).rename(
+            columns={"pace_seconds_per_100yd": "pace_min_per_100yd"}
         )
-        df["duration_min"] = (df["duration_seconds"] // 60).astype(int)
-        df["pace_min_per_100yd"] = df["pace_seconds_per_100yd"].apply(format_pace)
+        df["pace_min_per_100yd"] = format_pace_series(df["pace_min_per_100yd"])
 
         st.subheader("Swim Workouts (swim_workouts view)")
-        st.dataframe(
-            df[
-                [
-                    "workout_date",
-                    "start_time",
-                    "distance_yards",
-                    "duration_min",
-                    "pace_min_per_100yd",
-                    "avg_heart_rate_bpm",
-                    "effort_level",
-                    "notes",
-                ]
-            ],
-            width="stretch",
-        )
+        st.dataframe(df, width="stretch")
 
 
 # Add Workout
+
+def _gear_labels(user_id: int) -> dict[int, str]:
+    """
+    {gear_id: multiselect label} for this user's gear. The dict is kept in
+    st.session_state and only rebuilt when the (cached) gear rows change.
+    """
+    gear_rows = _cached_gear(user_id)
+    key = (user_id, hash(tuple(gear_rows)))
+    if st.session_state.get("gear_labels_key") == key:
+        return st.session_state["gear_labels"]
+
+    # gear_rows: (gear_id, gear label, total_distance_km)
+    gear_labels = {
+        gid: f"{gear} ({total_km:.1f} km total)"
+        for gid, gear, total_km in gear_rows
+    }
+    st.session_state["gear_labels_key"] = key
+    st.session_state["gear_labels"] = gear_labels
+    return gear_labels
+
+
 def render_add_workout(user_id: int):
     st.header("Add Workout")
 
     # Load gear list for this user (for selection later)
-    gear_rows = get_total_distance_per_gear(user_id)
-    # gear_rows: (gear_id, gear_type, brand, model, total_distance_km)
-    gear_map = {row[0]: row for row in gear_rows}
+    gear_labels = _gear_labels(user_id)
 
     with st.form("add_workout_form"):
         col_left, col_right = st.columns(2)
@@ -565,16 +525,11 @@ def render_add_workout(user_id: int):
         # ---------- Gear selection ----------
         st.markdown("#### Gear used (optional)")
 
-        if gear_map:
+        if gear_labels:
             selected_gear_ids = st.multiselect(
                 "Select gear used for this workout",
-                options=list(gear_map.keys()),
-                format_func=lambda gid: (
-                    f"{gear_map[gid][1]} - "
-                    f"{(gear_map[gid][2] or '').strip()} "
-                    f"{(gear_map[gid][3] or '').strip()} "
-                    f"({gear_map[gid][4]:.1f} km total)"
-                ),
+                options=list(gear_labels.keys()),
+                format_func=gear_labels.__getitem__,
                 help="You can select multiple items (e.g., bike + shoes).",
             )
         else:
@@ -598,7 +553,11 @@ def render_add_workout(user_id: int):
         cadence_val = avg_cadence if avg_cadence > 0 else None
         power_val = avg_power_w_val if (workout_type == "bike" and avg_power_w_val > 0) else None
 
-        start_time_clean = start_time_str.strip() or None
+        start_time_raw = start_time_str.strip()
+        start_time_clean = parse_start_time(start_time_raw)
+        if start_time_raw and start_time_clean is None:
+            st.error("Start time must be HH:MM (24-hour), e.g. 07:30.")
+            return
         notes_clean = notes.strip() or None
 
         # Use the first selected gear as the "primary" gear_id in Workouts
@@ -621,14 +580,14 @@ def render_add_workout(user_id: int):
                 avg_power_w=power_val,
                 gear_id=primary_gear_id,
                 notes=notes_clean,
+                # Attach all selected gear via the Workout_Gear table (for gear_distance view)
+                gear_ids=selected_gear_ids,
             )
 
-            # Attach all selected gear via the Workout_Gear table (for gear_distance view)
-            attach_gear_to_workout(workout_id, selected_gear_ids)
-
         except Exception as e:
             st.error(f"Error inserting workout: {e}")
         else:
+            _clear_query_caches()
             st.success(f"Workout saved (id={workout_id})")
 
 
@@ -666,6 +625,7 @@ def render_gear(user_id: int):
         except Exception as e:
             st.error(f"Error inserting gear: {e}")
         else:
+            _clear_query_caches()
             st.success(f"Gear added (id={gear_id})")
 
     st.markdown("---")
@@ -673,29 +633,16 @@ def render_gear(user_id: int):
     # --------- Gear distance view ---------
     st.subheader("Gear usage (from gear_distance view)")
 
-    rows = get_total_distance_per_gear(user_id)
+    rows = _cached_gear(user_id)
     if not rows:
         st.info("No gear found yet.")
         return
 
-    df = pd.DataFrame(
-        rows,
-        columns=["gear_id", "gear_type", "brand", "model", "total_distance_km"],
-    )
-    df["label"] = (
-        df["gear_type"]
-        + " - "
-        + df["brand"].fillna("")
-        + " "
-        + df["model"].fillna("")
-    ).str.strip()
-
     st.dataframe(
-        df[
-            ["gear_id", "label", "total_distance_km"]
-        ].rename(columns={"label": "gear", "total_distance_km": "total_distance_km"}),
+        pd.DataFrame(rows, columns=["gear_id", "gear", "total_distance_km"]),
         use_container_width=True,
     )
 
+
 if __name__ == "__main__":
     main()
@@ -1,19 +1,24 @@
-from datetime import datetime
+import sys
+from itertools import chain
+from datetime import datetime, timedelta
 
 from queries import (
-    get_user_id_by_username,
+    list_users,
     list_workout_types,
     insert_workout,
     get_recent_workouts,
     get_weekly_volume_by_sport,
     get_total_distance_per_gear,
 )
+from parsing import parse_start_time
 
 
 def prompt_username() -> int:
+    # Load all users once; retries on a mistyped name are then dict lookups
+    username_to_id = {username: uid for uid, username in list_users()}
     while True:
         username = input("Enter your username (e.g., 'cam'): ").strip()
-        user_id = get_user_id_by_username(username)
+        user_id = username_to_id.get(username)
         if user_id is not None:
             print(f"Hello, {username}! (user_id={user_id})")
             return user_id
@@ -29,7 +34,12 @@ def add_workout(user_id: int):
 
     workout_type_name = input("Workout type (swim/bike/run): ").strip().lower()
     date_str = input("Workout date (YYYY-MM-DD): ").strip()
-    start_time_str = input("Start time (HH:MM, optional - blank for none): ").strip()
+    while True:
+        start_time_str = input("Start time (HH:MM, optional - blank for none): ").strip()
+        start_time = parse_start_time(start_time_str)
+        if not start_time_str or start_time is not None:
+            break
+        print("Start time must be HH:MM (24-hour), e.g. 07:30.")
     duration_minutes = input("Duration (minutes): ").strip()
     distance_str = input("Distance (km): ").strip()
     effort_str = input("Effort level (1–10): ").strip()
@@ -37,7 +47,6 @@ def add_workout(user_id: int):
 
     # basic parsing
     workout_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-    start_time = start_time_str if start_time_str else None
     duration_seconds = int(float(duration_minutes) * 60)
     distance_km = float(distance_str)
     effort_level = int(effort_str)
@@ -77,15 +86,12 @@ def show_recent_workouts(user_id: int):
 
     print("\nDate       | Start | Type | Dist (km) | Duration (min) | Effort | Notes")
     print("-" * 80)
-    for r in rows:
-        workout_date, start_time, workout_type, distance_km, duration_sec, effort_level, notes = r
-        minutes = duration_sec // 60
-        start_str = start_time if start_time else "--:--"
-        note_snippet = (notes or "")[:30]
-        print(
-            f"{workout_date} | {start_str:5} | {workout_type:4} | "
-            f"{distance_km:9.2f} | {minutes:13d} | {effort_level:6d} | {note_snippet}"
-        )
+    lines = [
+        f"{workout_date} | {start_time.strftime('%H:%M') if start_time else '--:--'} | {workout_type:4} | "
+        f"{distance_km:9.2f} | {duration_sec // 60:13d} | {effort_level:6d} | {(notes or '')[:30]}"
+        for workout_date, start_time, workout_type, distance_km, duration_sec, effort_level, notes in rows
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def show_weekly_volume(user_id: int):
@@ -96,6 +102,11 @@ def show_weekly_volume(user_id: int):
     start_date = datetime.strptime(start_str, "%Y-%m-%d").date()
     end_date = datetime.strptime(end_str, "%Y-%m-%d").date()
 
+    # Totals come in whole Monday-Sunday weeks
+    start_date -= timedelta(days=start_date.weekday())
+    end_date += timedelta(days=6 - end_date.weekday())
+    print(f"Whole weeks: Mon {start_date} - Sun {end_date}")
+
     rows = get_weekly_volume_by_sport(user_id, start_date, end_date)
     if not rows:
         print("No workouts in this range.")
@@ -103,26 +114,29 @@ def show_weekly_volume(user_id: int):
 
     print("\nWeek Start | Type | Total Dist (km) | Total Dur (min)")
     print("-" * 60)
-    for week_start, workout_type, total_dist_km, total_dur_sec in rows:
-        minutes = total_dur_sec // 60
-        print(f"{week_start} | {workout_type:4} | {total_dist_km:15.2f} | {minutes:15d}")
+    lines = [
+        f"{week_start} | {workout_type:4} | {total_dist_km:15.2f} | {total_dur_min:15d}"
+        for week_start, workout_type, total_dist_km, total_dur_min, _total_dur_hours in rows
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def show_gear_totals(user_id: int):
     print("\n=== Total Distance per Gear ===")
     rows = get_total_distance_per_gear(user_id)
-    if not rows:
+    first = next(rows, None)
+    if first is None:
         print("No gear found.")
         return
 
     print("\nID | Type  | Brand       | Model        | Total Dist (km)")
     print("-" * 70)
-    for gear_id, gear_type, brand, model, total_dist_km in rows:
-        brand_disp = (brand or "")[:11]
-        model_disp = (model or "")[:12]
-        print(
-            f"{gear_id:2d} | {gear_type:5} | {brand_disp:11s} | {model_disp:12s} | {total_dist_km:15.2f}"
-        )
+    lines = [
+        f"{gear_id:2d} | {gear_type:5} | {(brand or '')[:11]:11s} | "
+        f"{(model or '')[:12]:12s} | {total_dist_km:15.2f}"
+        for gear_id, gear_type, brand, model, total_dist_km in chain((first,), rows)
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 def main():
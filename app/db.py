@@ -1,31 +1,152 @@
+import atexit
+import threading
+from contextlib import contextmanager
+
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """Connection that remembers which statements it has PREPAREd."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+
+# One pool per process. Streamlit imports this module once and reruns the
+# app script against it, so the pool survives reruns; the CLI and scripts
+# get the same behavior for free.
+_pool = None
+_pool_lock = threading.Lock()
 
+# Upper bound on open connections; the pool raises PoolError past it
+POOL_MAX_CONNECTIONS = 8
+# ThreadedConnectionPool closes a returned connection once it already holds
+# minconn idle ones, so keep every connection: each reconnect would also
+# lose its PREPAREd statements
+POOL_MIN_CONNECTIONS = POOL_MAX_CONNECTIONS
 
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    POOL_MIN_CONNECTIONS,
+                    POOL_MAX_CONNECTIONS,
+                    host="localhost",
+                    port=5432,
+                    dbname="triathlon_db",
+                    user="tri_user",
+                    # password="putpasswordhere",
+                    connection_factory=PreparingConnection,
+                )
+                atexit.register(_pool.closeall)
+    return _pool
+
+
+@contextmanager
 def get_connection():
-    conn = psycopg2.connect(
-        host="localhost",
-        port=5432,
-        dbname="triathlon_db",
-        user="tri_user",
-        # password="putpasswordhere",
-    )
-    return conn
+    """
+    Borrow a connection from the pool and hand it back when done.
+    Any transaction left open is rolled back by the pool on return; a
+    connection that broke is closed instead of being reused.
+    """
+    pool = _get_pool()
+    conn = pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except (psycopg2.OperationalError, psycopg2.InterfaceError):
+        # The connection itself failed: drop it so the pool opens a fresh one
+        broken = True
+        raise
+    finally:
+        pool.putconn(conn, close=broken or bool(conn.closed))
+
+
+def pool_stats() -> dict:
+    """
+    Snapshot of the pool for monitoring: closed flag, in-use and idle counts.
+    Reports zeros before the first connection, rather than opening the pool.
+    """
+    pool = _pool
+    if pool is None:
+        return {"closed": False, "in_use": 0, "idle": 0}
+    # ThreadedConnectionPool has no public counters; read its bookkeeping
+    # under the pool's own lock, which getconn/putconn hold while updating it
+    with pool._lock:
+        return {
+            "closed": pool.closed,
+            "in_use": len(pool._used),
+            "idle": len(pool._pool),
+        }
+
+
+@contextmanager
+def transaction(conn=None):
+    """
+    Yield a connection to run statements on. With no conn, borrow one from
+    the pool and commit (or roll back) when the block exits. A conn passed
+    in by the caller is used as-is: the caller owns its transaction, which
+    lets several query helpers share one connection and one commit.
+    """
+    if conn is not None:
+        yield conn
+        return
+    with get_connection() as conn:
+        with conn:
+            yield conn
+
+
+@contextmanager
+def read_only(conn=None):
+    """
+    Like transaction(), for helpers that only SELECT. A borrowed connection
+    runs in autocommit mode, so there is no BEGIN/COMMIT round trip around
+    the read. A conn passed in by the caller is used as-is.
+    """
+    if conn is not None:
+        yield conn
+        return
+    with get_connection() as conn:
+        conn.autocommit = True
+        try:
+            yield conn
+        finally:
+            conn.autocommit = False
+
+
+def execute_prepared(cur, name: str, sql: str, params: tuple) -> None:
+    """
+    Run sql (written with $1, $2, ... placeholders) as the server-side
+    prepared statement `name`. The PREPARE is sent the first time a pooled
+    connection sees the statement; later calls only send EXECUTE, so
+    Postgres skips parsing and planning.
+    """
+    conn = cur.connection
+    if name not in conn.prepared:
+        cur.execute(f"PREPARE {name} AS {sql}")
+        conn.prepared.add(name)
+    placeholders = ", ".join(["%s"] * len(params))
+    cur.execute(f"EXECUTE {name} ({placeholders});", params)
 
 
 def test_connection():
     try:
-        conn = get_connection()
-        with conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-                cur.execute("SELECT 1 AS test;")
-                row = cur.fetchone()
-                print("Test query result:", row["test"])
+        with get_connection() as conn:
+            with conn:
+                with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+                    cur.execute("SELECT 1 AS test;")
+                    row = cur.fetchone()
+                    print("Test query result:", row["test"])
+        print("Connection pool:", pool_stats())
     except Exception as e:
         print("Error connecting to database:", e)
-    finally:
-        if 'conn' in locals():
-            conn.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,16 @@
+import re
+from datetime import time
+from typing import Optional
+
+_TIME_RE = re.compile(r"^(\d{1,2}):(\d{2})$")
+
+
+def parse_start_time(text: str) -> Optional[time]:
+    """Parse 'HH:MM' (24-hour) into a time; None if blank or malformed."""
+    m = _TIME_RE.match(text)
+    if not m:
+        return None
+    hour, minute = int(m[1]), int(m[2])
+    if hour > 23 or minute > 59:
+        return None
+    return time(hour, minute)
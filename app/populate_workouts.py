@@ -1,106 +1,82 @@
 # app/populate_workouts.py
 
-import random
-from datetime import date, timedelta
+import sys
+from datetime import date, time, timedelta
 
-from db import get_connection
+import numpy as np
+
+from db import get_connection, transaction
 from queries import (
-    get_user_id_by_username,
-    insert_workout,
-    insert_gear,
-    attach_gear_to_workout,
+    get_workout_type_id_by_name,
+    build_workout_row,
+    insert_workouts_bulk,
+    insert_gear_bulk,
+    attach_gear_to_workouts_bulk,
 )
 
 USERNAME = "John"  # change this if your username is different
 
 
-def clear_user_data(user_id: int):
+def clear_user_data(username: str, conn=None) -> int | None:
     """
-    Delete all workouts (and related Workout_Gear rows via ON DELETE CASCADE)
-    and all Gear for the given user. Leaves other users' data alone.
+    Look up the user and delete all their workouts (and related Workout_Gear
+    rows via ON DELETE CASCADE) and all their Gear in a single statement.
+    Leaves other users' data alone. Returns the user_id, or None if no such
+    user exists (in which case nothing is deleted).
     """
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                # Delete Workout_Gear for this user's workouts
-                cur.execute(
-                    """
-                    DELETE FROM Workout_Gear
-                    WHERE workout_id IN (
-                        SELECT workout_id FROM Workouts WHERE user_id = %s
-                    );
-                    """,
-                    (user_id,),
-                )
-                print(f"Deleted {cur.rowcount} Workout_Gear rows for user_id={user_id}.")
-
-                # Delete workouts themselves
-                cur.execute(
-                    "DELETE FROM Workouts WHERE user_id = %s;",
-                    (user_id,),
+    with transaction(conn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                WITH u AS (
+                    SELECT user_id FROM Users WHERE username = %s
+                ),
+                del_w AS (
+                    DELETE FROM Workouts
+                    WHERE user_id IN (SELECT user_id FROM u)
+                    RETURNING 1
+                ),
+                del_g AS (
+                    DELETE FROM Gear
+                    WHERE user_id IN (SELECT user_id FROM u)
+                    RETURNING 1
                 )
-                print(f"Deleted {cur.rowcount} workouts for user_id={user_id}.")
-
-                # Delete gear for this user (will also cascade any remaining Workout_Gear)
-                cur.execute(
-                    "DELETE FROM Gear WHERE user_id = %s;",
-                    (user_id,),
-                )
-                print(f"Deleted {cur.rowcount} gear items for user_id={user_id}.")
-    finally:
-        conn.close()
-
-
-def create_demo_gear(user_id: int) -> dict[str, list[int]]:
-    shoes_train = insert_gear(
-        user_id=user_id,
-        gear_type="shoe",
-        brand="Nike",
-        model="Pegasus 41",
-        purchase_date=date(2025, 7, 1),
-        retired=False,
-    )
-    shoes_race = insert_gear(
-        user_id=user_id,
-        gear_type="shoe",
-        brand="Nike",
-        model="Alphafly 3",
-        purchase_date=date(2025, 8, 15),
-        retired=False,
-    )
-    road_bike = insert_gear(
-        user_id=user_id,
-        gear_type="bike",
-        brand="Trek",
-        model="Emonda SL6",
-        purchase_date=date(2025, 4, 10),
-        retired=False,
-    )
-    tt_bike = insert_gear(
-        user_id=user_id,
-        gear_type="bike",
-        brand="Canyon",
-        model="Speedmax CF",
-        purchase_date=date(2025, 6, 5),
-        retired=False,
-    )
-    pool_goggles = insert_gear(
-        user_id=user_id,
-        gear_type="goggles",
-        brand="Speedo",
-        model="Vanquisher 2.0",
-        purchase_date=date(2025, 3, 1),
-        retired=False,
-    )
-    wetsuit = insert_gear(
-        user_id=user_id,
-        gear_type="wetsuit",
-        brand="Orca",
-        model="Athlex",
-        purchase_date=date(2025, 5, 20),
-        retired=False,
-    )
+                SELECT
+                    user_id,
+                    (SELECT COUNT(*) FROM del_w),
+                    (SELECT COUNT(*) FROM del_g)
+                FROM u;
+                """,
+                (username,),
+            )
+            row = cur.fetchone()
+
+    if row is None:
+        return None
+    user_id, workouts_deleted, gear_deleted = row
+    print(f"Deleted {workouts_deleted} workouts for user_id={user_id}.")
+    print(f"Deleted {gear_deleted} gear items for user_id={user_id}.")
+    return user_id
+
+
+def create_demo_gear(user_id: int, conn=None) -> dict[str, list[int]]:
+    # (user_id, gear_type, brand, model, purchase_date, retired)
+    demo_gear = [
+        (user_id, "shoe", "Nike", "Pegasus 41", date(2025, 7, 1), False),
+        (user_id, "shoe", "Nike", "Alphafly 3", date(2025, 8, 15), False),
+        (user_id, "bike", "Trek", "Emonda SL6", date(2025, 4, 10), False),
+        (user_id, "bike", "Canyon", "Speedmax CF", date(2025, 6, 5), False),
+        (user_id, "goggles", "Speedo", "Vanquisher 2.0", date(2025, 3, 1), False),
+        (user_id, "wetsuit", "Orca", "Athlex", date(2025, 5, 20), False),
+    ]
+    (
+        shoes_train,
+        shoes_race,
+        road_bike,
+        tt_bike,
+        pool_goggles,
+        wetsuit,
+    ) = insert_gear_bulk(demo_gear, conn=conn)
 
     gear_by_sport = {
         "run": [shoes_train, shoes_race],
@@ -115,153 +91,159 @@ def create_demo_gear(user_id: int) -> dict[str, list[int]]:
     return gear_by_sport
 
 
-def random_time() -> str:
-    """Return a random time string HH:MM (morning or afternoon)."""
-    if random.random() < 0.5:
-        hour = random.randint(6, 9)   # morning
+def random_time(rng: np.random.Generator) -> time:
+    """Return a random start time (morning or afternoon)."""
+    if rng.random() < 0.5:
+        hour = int(rng.integers(6, 9, endpoint=True))   # morning
     else:
-        hour = random.randint(16, 19) # evening
-    minute = random.choice([0, 15, 30, 45])
-    return f"{hour:02d}:{minute:02d}"
-
-
-def trending_workout_for_type(workout_type: str, week_index: int):
-    # Growth factor: starts at ~1.0 and grows with weeks
-    growth_factor = 1.0 + week_index * 0.10  # +10% per week
-
-    if workout_type == "swim":
-        # Base: 1–3 km, 20–60 minutes
-        base_dist = random.uniform(1.0, 3.0)
-        base_dur = random.randint(20, 60)
-
-        distance_km = min(base_dist * growth_factor, 5.0)
-        duration_minutes = min(base_dur * growth_factor, 120.0)
-
-        # Swim-specific metrics
-        elevation_gain_m = 0.0
-        avg_cadence = random.uniform(25, 40)  # strokes per minute
-        avg_power_w = None  # not really used for swim
-
-    elif workout_type == "bike":
-        # Base: 20–70 km, 60–180 minutes
-        base_dist = random.uniform(20.0, 70.0)
-        base_dur = random.randint(60, 180)
-
-        distance_km = min(base_dist * growth_factor, 150.0)
-        duration_minutes = min(base_dur * growth_factor, 360.0)
-
-        # Bike-specific metrics
-        elevation_gain_m = random.uniform(100, 2000)  # more climbing possible
-        avg_cadence = random.uniform(75, 95)          # rpm
-        # Tie power roughly to effort + growth
-        base_power = random.uniform(140, 220)
-        avg_power_w = min(base_power * (1.0 + 0.03 * week_index), 350.0)
+        hour = int(rng.integers(16, 19, endpoint=True)) # evening
+    minute = int(rng.integers(4)) * 15  # :00, :15, :30 or :45
+    return time(hour, minute)
+
+
+# Per-sport generation parameters, indexed by position in SPORTS.
+SPORTS = ("swim", "bike", "run")
+_SPORT_INDEX = {sport: i for i, sport in enumerate(SPORTS)}
+_BIKE = _SPORT_INDEX["bike"]
+
+# Base distance (km) / duration (min) ranges and their caps
+#   swim: 1–3 km, 20–60 min | bike: 20–70 km, 60–180 min | run: 5–18 km, 30–100 min
+_DIST_LO = np.array([1.0, 20.0, 5.0])
+_DIST_HI = np.array([3.0, 70.0, 18.0])
+_DIST_CAP = np.array([5.0, 150.0, 30.0])
+_DUR_LO = np.array([20, 60, 30])
+_DUR_HI = np.array([60, 180, 100])
+_DUR_CAP = np.array([120.0, 360.0, 180.0])
+# Elevation gain (m): none for swim, more climbing possible on the bike
+_ELEV_LO = np.array([0.0, 100.0, 50.0])
+_ELEV_HI = np.array([0.0, 2000.0, 800.0])
+# Cadence: strokes/min (swim), rpm (bike), steps/min (run)
+_CAD_LO = np.array([25.0, 75.0, 155.0])
+_CAD_HI = np.array([40.0, 95.0, 180.0])
+# Rough calorie burn and heart-rate baseline per sport
+_KCAL_PER_MIN = np.array([9.0, 8.0, 11.0])
+_HR_BASE = np.array([120, 125, 130])
+
+
+_NOTES_BY_SPORT = {
+    "swim": (
+        "Pool intervals",
+        "Easy endurance swim",
+        "Drills + technique",
+        "Tempo swim set",
+        "Open water simulation in pool",
+    ),
+    "bike": (
+        "Endurance ride",
+        "Intervals on trainer",
+        "Long ride outside",
+        "Hill repeats",
+        "Sweet spot workout",
+    ),
+    "run": (
+        "Easy run",
+        "Tempo run",
+        "Long run",
+        "Track workout",
+        "Brick run off the bike",
+    ),
+}
+
+
+def generate_workout_metrics(
+    workout_types: list[str],
+    week_indices: list[int],
+    rng: np.random.Generator,
+) -> list[tuple]:
+    """
+    Generate metrics for every planned workout at once, with volume growing
+    week over week. Returns one tuple per workout:
+    (duration_seconds, distance_km, effort_level, elevation_gain_m,
+     calories_kcal, avg_heart_rate_bpm, avg_cadence, avg_power_w)
+    """
+    n = len(workout_types)
+    sport = np.array([_SPORT_INDEX[t] for t in workout_types], dtype=np.int64)
+    week = np.asarray(week_indices, dtype=np.int64)
 
-    else:  # run
-        # Base: 5–18 km, 30–100 minutes
-        base_dist = random.uniform(5.0, 18.0)
-        base_dur = random.randint(30, 100)
+    # Growth factor: starts at ~1.0 and grows with weeks (+10% per week)
+    growth = 1.0 + week * 0.10
 
-        distance_km = min(base_dist * growth_factor, 30.0)
-        duration_minutes = min(base_dur * growth_factor, 180.0)
+    distance_km = np.minimum(
+        rng.uniform(_DIST_LO[sport], _DIST_HI[sport]) * growth, _DIST_CAP[sport]
+    )
+    duration_minutes = np.minimum(
+        rng.integers(_DUR_LO[sport], _DUR_HI[sport], endpoint=True) * growth,
+        _DUR_CAP[sport],
+    )
+    elevation_gain_m = rng.uniform(_ELEV_LO[sport], _ELEV_HI[sport])
+    avg_cadence = rng.uniform(_CAD_LO[sport], _CAD_HI[sport])
 
-        # Run-specific metrics
-        elevation_gain_m = random.uniform(50, 800)
-        avg_cadence = random.uniform(155, 180)  # steps per minute
-        avg_power_w = None  # you could fill this if you want running power
+    # Power only for bike; tie it roughly to growth
+    base_power = rng.uniform(140, 220, size=n)
+    avg_power_w = np.where(
+        sport == _BIKE, np.minimum(base_power * (1.0 + 0.03 * week), 350.0), np.nan
+    )
 
-    duration_seconds = int(duration_minutes * 60)
+    duration_seconds = (duration_minutes * 60).astype(np.int64)
 
     # Effort trends mildly up too but stays in a realistic range
-    base_effort = random.randint(5, 8)
-    effort_level = max(3, min(10, base_effort + week_index // 4))
+    effort_level = np.clip(rng.integers(5, 8, size=n, endpoint=True) + week // 4, 3, 10)
 
     # Calories: rough estimate based on duration and effort
     # (not meant to be physiologically accurate, just plausible numbers)
-    # Base kcal/min by sport:
-    if workout_type == "swim":
-        base_kcal_per_min = 9.0
-    elif workout_type == "bike":
-        base_kcal_per_min = 8.0
-    else:  # run
-        base_kcal_per_min = 11.0
-
-    calories_kcal = int(duration_minutes * base_kcal_per_min * (0.9 + 0.02 * effort_level))
+    calories_kcal = (
+        duration_minutes * _KCAL_PER_MIN[sport] * (0.9 + 0.02 * effort_level)
+    ).astype(np.int64)
 
     # Heart rate: tie to effort level
-    if workout_type == "swim":
-        hr_base = 120
-    elif workout_type == "bike":
-        hr_base = 125
-    else:  # run
-        hr_base = 130
-
-    avg_heart_rate_bpm = int(
-        hr_base + 5 * (effort_level - 5) + random.uniform(-5, 5)
+    avg_heart_rate_bpm = np.clip(
+        (_HR_BASE[sport] + 5 * (effort_level - 5) + rng.uniform(-5, 5, size=n)).astype(np.int64),
+        100,
+        190,
     )
-    avg_heart_rate_bpm = max(100, min(avg_heart_rate_bpm, 190))
-
-    return (
-        duration_seconds,
-        round(distance_km, 1),
-        effort_level,
-        round(elevation_gain_m, 1),
-        calories_kcal,
-        avg_heart_rate_bpm,
-        round(avg_cadence, 1),
-        avg_power_w,
-    )
-
-
-def choose_gear_for_workout(workout_type: str, gear_by_sport: dict[str, list[int]]) -> list[int]:
-    """
-    Choose a list of gear_ids appropriate for this workout type.
-    We keep it simple but plausible.
-    """
-    gear_ids: list[int] = []
 
-    sport_gear = gear_by_sport.get(workout_type, [])
-    if not sport_gear:
-        return gear_ids
+    # Back to plain Python values for the driver
+    return list(
+        zip(
+            duration_seconds.tolist(),
+            np.round(distance_km, 1).tolist(),
+            effort_level.tolist(),
+            np.round(elevation_gain_m, 1).tolist(),
+            calories_kcal.tolist(),
+            avg_heart_rate_bpm.tolist(),
+            np.round(avg_cadence, 1).tolist(),
+            [None if np.isnan(p) else p for p in avg_power_w.tolist()],
+        )
+    )
 
-    if workout_type == "run":
-        # Use one pair of shoes (training or race)
-        gear_ids.append(random.choice(sport_gear))
-    elif workout_type == "bike":
-        # Usually one bike; occasionally use a different bike
-        gear_ids.append(random.choice(sport_gear))
-    else:  # swim
-        # Usually goggles, sometimes goggles + wetsuit
-        goggles_id = sport_gear[0]
-        gear_ids.append(goggles_id)
-        if len(sport_gear) > 1 and random.random() < 0.3:
-            gear_ids.append(sport_gear[1])
 
-    return gear_ids
+def repopulate_trending_workouts():
+    # One connection and one transaction for the whole run
+    with get_connection() as conn:
+        with conn:
+            _repopulate_trending_workouts(conn)
 
 
-def repopulate_trending_workouts():
-    user_id = get_user_id_by_username(USERNAME)
+def _repopulate_trending_workouts(conn):
+    # 1. Resolve the user and clear existing data (workouts + gear) in one go
+    user_id = clear_user_data(USERNAME, conn=conn)
     if user_id is None:
         raise ValueError(
             f"User '{USERNAME}' not found. Make sure you ran seed_demo.py or created this user."
         )
 
-    # 1. Clear existing data (workouts + gear) for this user
-    clear_user_data(user_id)
-
     # 2. Create demo gear for this user
-    gear_by_sport = create_demo_gear(user_id)
+    gear_by_sport = create_demo_gear(user_id, conn=conn)
 
     # 3. Insert new trending workouts from Oct 1 to Dec 31, 2025
     start = date(2025, 10, 1)
     end = date(2025, 12, 31)
 
     current = start
-    count = 0
+    schedule = []  # (workout_date, week_index, workout_type)
 
-    # For consistent experiments
-    random.seed(341)
+    # For consistent experiments: one generator drives every random draw
+    rng = np.random.default_rng(341)
 
     while current <= end:
         days_from_start = (current - start).days
@@ -269,13 +251,13 @@ def repopulate_trending_workouts():
 
         # Probability of any workouts on this day increases over time
         base_prob = 0.4 + min(0.02 * week_index, 0.3)  # up to 0.7
-        if random.random() > base_prob:
+        if rng.random() > base_prob:
             current += timedelta(days=1)
             continue
 
         # Number of workouts: mostly 1, sometimes 2 bricks, occasional 3 in heavy weeks
         probs = [0.7, 0.25, 0.05]  # for 1, 2, 3 workouts
-        r = random.random()
+        r = rng.random()
         if r < probs[0]:
             num_workouts = 1
         elif r < probs[0] + probs[1]:
@@ -288,87 +270,97 @@ def repopulate_trending_workouts():
         bike_w = min(0.50, 0.35 + 0.007 * week_index)
         run_w = 1.0 - swim_w - bike_w
 
-        for _ in range(num_workouts):
-            workout_type = random.choices(
-                population=["swim", "bike", "run"],
-                weights=[swim_w, bike_w, run_w],
-                k=1,
-            )[0]
-
-            (
-                duration_seconds,
-                distance_km,
-                effort_level,
-                elevation_gain_m,
-                calories_kcal,
-                avg_hr,
-                avg_cadence,
-                avg_power_w,
-            ) = trending_workout_for_type(workout_type, week_index)
-
-            start_time_str = random_time()
-
-            notes_options = {
-                "swim": [
-                    "Pool intervals",
-                    "Easy endurance swim",
-                    "Drills + technique",
-                    "Tempo swim set",
-                    "Open water simulation in pool",
-                ],
-                "bike": [
-                    "Endurance ride",
-                    "Intervals on trainer",
-                    "Long ride outside",
-                    "Hill repeats",
-                    "Sweet spot workout",
-                ],
-                "run": [
-                    "Easy run",
-                    "Tempo run",
-                    "Long run",
-                    "Track workout",
-                    "Brick run off the bike",
-                ],
-            }
-
-            notes = random.choice(notes_options[workout_type])
-
-            # Choose gear for this workout
-            gear_ids = choose_gear_for_workout(workout_type, gear_by_sport)
-            primary_gear_id = gear_ids[0] if gear_ids else None
-
-            workout_id = insert_workout(
-                user_id=user_id,
-                workout_type_name=workout_type,
-                workout_date=current,
-                duration_seconds=duration_seconds,
-                distance_km=distance_km,
-                effort_level=effort_level,
-                location_id=None,
-                start_time=start_time_str,
-                elevation_gain_m=elevation_gain_m,
-                calories_kcal=calories_kcal,
-                avg_heart_rate_bpm=avg_hr,
-                avg_cadence=avg_cadence,
-                avg_power_w=avg_power_w,
-                gear_id=primary_gear_id,
-                notes=notes,
-            )
+        # One draw for the whole day
+        types_today = rng.choice(SPORTS, size=num_workouts, p=[swim_w, bike_w, run_w])
+        for workout_type in types_today.tolist():
+            schedule.append((current, week_index, workout_type))
 
-            # Attach all gear for this workout -> populates Workout_Gear (driving gear_distance view)
-            attach_gear_to_workout(workout_id, gear_ids)
+        current += timedelta(days=1)
 
-            count += 1
-            print(
-                f"{current} | {workout_type:4} | {distance_km:5.1f} km | "
-                f"{duration_seconds//60:4d} min | eff {effort_level} | "
-                f"HR {avg_hr} | gear {gear_ids} | id={workout_id}"
-            )
+    # Metrics for every scheduled workout in one vectorized pass
+    metrics = generate_workout_metrics(
+        [workout_type for _, _, workout_type in schedule],
+        [week_index for _, week_index, _ in schedule],
+        rng,
+    )
 
-        current += timedelta(days=1)
+    # Per-sport lookups resolved once: (notes, gear_ids, is_swim)
+    sport_tables = {
+        sport: (_NOTES_BY_SPORT[sport], gear_by_sport.get(sport, []), sport == "swim")
+        for sport in SPORTS
+    }
+
+    planned = []  # (workout row, gear_ids, log line)
+    for (workout_date, _, workout_type), workout_metrics in zip(schedule, metrics):
+        (
+            duration_seconds,
+            distance_km,
+            effort_level,
+            elevation_gain_m,
+            calories_kcal,
+            avg_hr,
+            avg_cadence,
+            avg_power_w,
+        ) = workout_metrics
+
+        start_time = random_time(rng)
+
+        sport_notes, sport_gear, is_swim = sport_tables[workout_type]
+        notes = sport_notes[rng.integers(len(sport_notes))]
+
+        # Choose gear for this workout (kept simple but plausible)
+        gear_ids = []
+        if sport_gear:
+            if is_swim:
+                # Usually goggles, sometimes goggles + wetsuit
+                gear_ids.append(sport_gear[0])
+                if len(sport_gear) > 1 and rng.random() < 0.3:
+                    gear_ids.append(sport_gear[1])
+            else:
+                # One pair of shoes (training or race) / one of the bikes
+                gear_ids.append(sport_gear[rng.integers(len(sport_gear))])
+        primary_gear_id = gear_ids[0] if gear_ids else None
+
+        workout_type_id = get_workout_type_id_by_name(workout_type, conn=conn)
+        row = build_workout_row(
+            user_id=user_id,
+            workout_type_id=workout_type_id,
+            workout_date=workout_date,
+            duration_seconds=duration_seconds,
+            distance_km=distance_km,
+            effort_level=effort_level,
+            location_id=None,
+            start_time=start_time,
+            elevation_gain_m=elevation_gain_m,
+            calories_kcal=calories_kcal,
+            avg_heart_rate_bpm=avg_hr,
+            avg_cadence=avg_cadence,
+            avg_power_w=avg_power_w,
+            gear_id=primary_gear_id,
+            notes=notes,
+        )
+        log_line = (
+            f"{workout_date} | {workout_type:4} | {distance_km:5.1f} km | "
+            f"{duration_seconds//60:4d} min | eff {effort_level} | "
+            f"HR {avg_hr} | gear {gear_ids}"
+        )
+        planned.append((row, gear_ids, log_line))
+
+    # 4. Insert all workouts in batched multi-row INSERTs
+    workout_ids = insert_workouts_bulk([row for row, _, _ in planned], conn=conn)
+
+    gear_pairs = []
+    log_lines = []
+    for workout_id, (_, gear_ids, log_line) in zip(workout_ids, planned):
+        gear_pairs.extend((workout_id, gid) for gid in set(gear_ids))
+        log_lines.append(f"{log_line} | id={workout_id}")
+    # One write for the whole log instead of a print per workout
+    sys.stdout.write("\n".join(log_lines) + "\n")
+
+    # Attach all gear in one go -> populates Workout_Gear (driving gear_distance view)
+    attach_gear_to_workouts_bulk(gear_pairs, conn=conn)
 
-    print(f"\nDone. Inserted {count} workouts for user '{USERNAME}' with attached gear.")
+    print(f"\nDone. Inserted {len(workout_ids)} workouts for user '{USERNAME}' with attached gear.")
     
 
 if __name__ == "__main__":
@@ -1,71 +1,150 @@
 # app/queries.py
 
-from datetime import date
-from typing import List, Optional, Tuple
+from datetime import date, time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import psycopg2.extras
+
+from db import execute_prepared, read_only, transaction
+
+# Rows taken per fetchmany() call in _fetch_columns
+_FETCH_SIZE = 2000
+
+
+def _fetch_columns(cur) -> Dict[str, list]:
+    """
+    Fetch the result set column-wise as {column name: values}, _FETCH_SIZE
+    rows at a time. Returns {} when there are no rows.
+
+    Only a named (server-side) cursor streams here. The callers run a
+    prepared EXECUTE on a client-side cursor, since DECLARE cannot wrap
+    EXECUTE. libpq has then already buffered the whole result, and the
+    chunking only bounds the row tuples built per step. They trade
+    streaming for a reused plan, which is fine for one user's history.
+    """
+    names = None
+    columns: List[list] = []
+    while True:
+        rows = cur.fetchmany(_FETCH_SIZE)
+        if not rows:
+            break
+        if names is None:
+            # named cursors only fill in description after the first fetch
+            names = [col[0] for col in cur.description]
+            columns = [[] for _ in names]
+        for values, chunk in zip(columns, zip(*rows)):
+            values.extend(chunk)
+    if names is None:
+        return {}
+    return dict(zip(names, columns))
+
+
+def list_users(conn=None) -> List[Tuple[int, str]]:
+    with read_only(conn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT user_id, username FROM Users ORDER BY username;"
+            )
+            return cur.fetchall()
+
+def get_user_id_by_username(username: str, conn=None) -> Optional[int]:
+    with read_only(conn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT user_id FROM Users WHERE username = %s;",
+                (username,)
+            )
+            row = cur.fetchone()
+            if row:
+                return row[0]
+            return None
+
+
+# Workout_Types is a tiny, effectively static table; remember ids once seen
+_workout_type_ids: Dict[str, int] = {}
+
+
+def get_workout_type_id_by_name(name: str, conn=None) -> Optional[int]:
+    workout_type_id = _workout_type_ids.get(name)
+    if workout_type_id is not None:
+        return workout_type_id
+
+    with read_only(conn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT workout_type_id FROM Workout_Types WHERE name = %s;",
+                (name,)
+            )
+            row = cur.fetchone()
+            if row:
+                _workout_type_ids[name] = row[0]
+                return row[0]
+            return None
+
+
+def list_workout_types(conn=None) -> List[Tuple[int, str]]:
+    with read_only(conn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT workout_type_id, name FROM Workout_Types ORDER BY workout_type_id;"
+            )
+            return cur.fetchall()
 
-from db import get_connection
 
+# ---------- Core operations ----------
 
-def list_users() -> List[Tuple[int, str]]:
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT user_id, username FROM Users ORDER BY username;"
-                )
-                return cur.fetchall()
-    finally:
-        conn.close()
-
-def get_user_id_by_username(username: str) -> Optional[int]:
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT user_id FROM Users WHERE username = %s;",
-                    (username,)
-                )
-                row = cur.fetchone()
-                if row:
-                    return row[0]
-                return None
-    finally:
-        conn.close()
-
-
-def get_workout_type_id_by_name(name: str) -> Optional[int]:
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT workout_type_id FROM Workout_Types WHERE name = %s;",
-                    (name,)
-                )
-                row = cur.fetchone()
-                if row:
-                    return row[0]
-                return None
-    finally:
-        conn.close()
-
-
-def list_workout_types() -> List[Tuple[int, str]]:
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT workout_type_id, name FROM Workout_Types ORDER BY workout_type_id;"
-                )
-                return cur.fetchall()
-    finally:
-        conn.close()
+# Column order shared by build_workout_row() and the Workouts INSERTs
+_WORKOUT_COLUMNS = """
+    user_id, workout_type_id, location_id,
+    workout_date, start_time,
+    duration_seconds, distance_m,
+    elevation_gain_m, calories_kcal,
+    avg_heart_rate_bpm, avg_cadence, avg_power_w,
+    effort_level, gear_id, notes
+"""
 
 
-# ---------- Core operations ----------
+def build_workout_row(
+    user_id: int,
+    workout_type_id: int,
+    workout_date: date,
+    duration_seconds: int,
+    distance_km: float,
+    effort_level: int,
+    location_id: Optional[int] = None,
+    start_time: Optional[time] = None,
+    elevation_gain_m: Optional[float] = None,
+    calories_kcal: Optional[int] = None,
+    avg_heart_rate_bpm: Optional[int] = None,
+    avg_cadence: Optional[float] = None,
+    avg_power_w: Optional[float] = None,
+    gear_id: Optional[int] = None,
+    notes: Optional[str] = None,
+) -> Tuple:
+    """Values for one Workouts row, in _WORKOUT_COLUMNS order."""
+    # Convert km -> m for canonical storage
+    distance_m = None
+    if distance_km is not None:
+        distance_m = distance_km * 1000.0
+
+    return (
+        user_id,
+        workout_type_id,
+        location_id,
+        workout_date,
+        start_time,
+        duration_seconds,
+        distance_m,
+        elevation_gain_m,
+        calories_kcal,
+        avg_heart_rate_bpm,
+        avg_cadence,
+        avg_power_w,
+        effort_level,
+        gear_id,
+        notes,
+    )
+
 
 def insert_workout(
     user_id: int,
@@ -75,7 +154,7 @@ def insert_workout(
     distance_km: float,
     effort_level: int,
     location_id: Optional[int] = None,
-    start_time: Optional[str] = None,  # 'HH:MM' or None
+    start_time: Optional[time] = None,
     elevation_gain_m: Optional[float] = None,
     calories_kcal: Optional[int] = None,
     avg_heart_rate_bpm: Optional[int] = None,
@@ -83,30 +162,44 @@ def insert_workout(
     avg_power_w: Optional[float] = None,
     gear_id: Optional[int] = None,
     notes: Optional[str] = None,
+    gear_ids: Optional[list[int]] = None,
+    conn=None,
 ) -> int:
-    workout_type_id = get_workout_type_id_by_name(workout_type_name)
+    """
+    Insert one workout and return its id. Any gear_ids are attached via
+    Workout_Gear in the same transaction.
+    """
+    workout_type_id = get_workout_type_id_by_name(workout_type_name, conn=conn)
     if workout_type_id is None:
         raise ValueError(f"Unknown workout type: {workout_type_name}")
 
-    # Convert km -> m for canonical storage
-    distance_m = None
-    if distance_km is not None:
-        distance_m = distance_km * 1000.0
-
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO Workouts (
-                        user_id, workout_type_id, location_id,
-                        workout_date, start_time,
-                        duration_seconds, distance_m,
-                        elevation_gain_m, calories_kcal,
-                        avg_heart_rate_bpm, avg_cadence, avg_power_w,
-                        effort_level, gear_id, notes
-                    ) VALUES (
+    row = build_workout_row(
+        user_id=user_id,
+        workout_type_id=workout_type_id,
+        workout_date=workout_date,
+        duration_seconds=duration_seconds,
+        distance_km=distance_km,
+        effort_level=effort_level,
+        location_id=location_id,
+        start_time=start_time,
+        elevation_gain_m=elevation_gain_m,
+        calories_kcal=calories_kcal,
+        avg_heart_rate_bpm=avg_heart_rate_bpm,
+        avg_cadence=avg_cadence,
+        avg_power_w=avg_power_w,
+        gear_id=gear_id,
+        notes=notes,
+    )
+
+    with transaction(conn) as conn:
+        with conn.cursor() as cur:
+            # Workout and its gear links in one statement: the gear INSERT
+            # reads the new id from the CTE instead of a second round trip
+            cur.execute(
+                f"""
+                WITH w AS (
+                    INSERT INTO Workouts ({_WORKOUT_COLUMNS})
+                    VALUES (
                         %s, %s, %s,
                         %s, %s,
                         %s, %s,
@@ -114,291 +207,296 @@ def insert_workout(
                         %s, %s, %s,
                         %s, %s, %s
                     )
+                    RETURNING workout_id
+                ),
+                g AS (
+                    INSERT INTO Workout_Gear (workout_id, gear_id)
+                    SELECT w.workout_id, gid
+                    FROM w, unnest(%s::int[]) AS gid
+                    ON CONFLICT DO NOTHING
+                )
+                SELECT workout_id FROM w;
+                """,
+                row + (list(set(gear_ids or [])),),
+            )
+            workout_id = cur.fetchone()[0]
+            return workout_id
+
+
+def insert_workouts_bulk(rows: List[Tuple], page_size: int = 5000, conn=None) -> List[int]:
+    """
+    Insert many build_workout_row() tuples in one transaction. Each page of
+    page_size rows is sent as one array per column and expanded server-side
+    by INSERT ... SELECT FROM unnest(...), so there is no per-row VALUES
+    text to build or parse. Returns the new workout_ids in input order.
+    """
+    if not rows:
+        return []
+
+    workout_ids: List[int] = []
+    with transaction(conn) as conn:
+        with conn.cursor() as cur:
+            for i in range(0, len(rows), page_size):
+                columns = [list(col) for col in zip(*rows[i:i + page_size])]
+                cur.execute(
+                    f"""
+                    INSERT INTO Workouts ({_WORKOUT_COLUMNS})
+                    SELECT * FROM unnest(
+                        %s::int[], %s::int[], %s::int[],
+                        %s::date[], %s::time[],
+                        %s::int[], %s::numeric[],
+                        %s::numeric[], %s::int[],
+                        %s::int[], %s::numeric[], %s::numeric[],
+                        %s::int[], %s::int[], %s::text[]
+                    )
                     RETURNING workout_id;
                     """,
-                    (
-                        user_id,
-                        workout_type_id,
-                        location_id,
-                        workout_date,
-                        start_time,
-                        duration_seconds,
-                        distance_m,
-                        elevation_gain_m,
-                        calories_kcal,
-                        avg_heart_rate_bpm,
-                        avg_cadence,
-                        avg_power_w,
-                        effort_level,
-                        gear_id,
-                        notes,
-                    ),
+                    columns,
                 )
-                workout_id = cur.fetchone()[0]
-                return workout_id
-    finally:
-        conn.close()
+                workout_ids.extend(r[0] for r in cur.fetchall())
+    return workout_ids
 
 
 def get_recent_workouts(
     user_id: int,
-    limit: int = 10
+    limit: int = 10,
+    conn=None,
 ) -> List[Tuple]:
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT
-                        w.workout_date,
-                        COALESCE(w.start_time::text, '') AS start_time,
-                        wt.name AS workout_type,
-                        -- meters -> km
-                        (w.distance_m / 1000.0) AS distance_km,
-                        w.duration_seconds,
-                        w.effort_level,
-                        w.notes
-                    FROM Workouts w
-                    JOIN Workout_Types wt
-                      ON w.workout_type_id = wt.workout_type_id
-                    WHERE w.user_id = %s
-                    ORDER BY w.workout_date DESC, w.start_time DESC NULLS LAST
-                    LIMIT %s;
-                    """,
-                    (user_id, limit),
-                )
-                return cur.fetchall()
-    finally:
-        conn.close()
+    with read_only(conn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT
+                    w.workout_date,
+                    COALESCE(w.start_time::text, '') AS start_time,
+                    wt.name AS workout_type,
+                    w.distance_km,
+                    w.duration_seconds,
+                    w.effort_level,
+                    w.notes
+                FROM Workouts w
+                JOIN Workout_Types wt
+                  ON w.workout_type_id = wt.workout_type_id
+                WHERE w.user_id = %s
+                ORDER BY w.workout_date DESC, w.start_time DESC NULLS LAST
+                LIMIT %s;
+                """,
+                (user_id, limit),
+            )
+            return cur.fetchall()
 
 
 def get_weekly_volume_by_sport(
     user_id: int,
     start_date: date,
-    end_date: date
-) -> List[Tuple]:
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT
-                        date_trunc('week', w.workout_date)::date AS week_start,
-                        wt.name AS workout_type,
-                        -- meters -> km
-                        COALESCE(SUM(w.distance_m) / 1000.0, 0) AS total_distance_km,
-                        COALESCE(SUM(w.duration_seconds), 0) AS total_duration_sec
-                    FROM Workouts w
-                    JOIN Workout_Types wt
-                      ON w.workout_type_id = wt.workout_type_id
-                    WHERE w.user_id = %s
-                      AND w.workout_date BETWEEN %s AND %s
-                    GROUP BY week_start, wt.name
-                    ORDER BY week_start ASC, wt.name;
-                    """,
-                    (user_id, start_date, end_date),
-                )
-                return cur.fetchall()
-    finally:
-        conn.close()
-
-
-def get_total_distance_per_gear(user_id: int) -> List[Tuple]:
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    SELECT
-                        gear_id,
-                        gear_type,
-                        brand,
-                        model,
-                        (total_distance_m / 1000.0) AS total_distance_km
-                    FROM gear_distance
-                    WHERE user_id = %s
-                    ORDER BY total_distance_m DESC, gear_id;
-                    """,
-                    (user_id,),
-                )
-                return cur.fetchall()
-    finally:
-        conn.close()
-
-
-def fetch_workouts(
-    user_id: int,
-    workout_type_name: Optional[str] = None,
-    start_date: Optional[date] = None,
-    end_date: Optional[date] = None,
+    end_date: date,
+    conn=None,
 ) -> List[Tuple]:
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                base_query = """
-                    SELECT
-                        w.workout_id,
-                        w.workout_date,
-                        w.start_time,
-                        wt.name AS workout_type,
-                        (w.distance_m / 1000.0) AS distance_km,
-                        w.duration_seconds,
-                        w.effort_level,
-                        w.notes
-                    FROM Workouts w
-                    JOIN Workout_Types wt
-                      ON w.workout_type_id = wt.workout_type_id
-                    WHERE w.user_id = %s
+    with read_only(conn) as conn:
+        with conn.cursor() as cur:
+            execute_prepared(
+                cur,
+                "weekly_volume_by_sport",
                 """
-                params = [user_id]
-
-                if workout_type_name and workout_type_name != "All":
-                    base_query += " AND wt.name = %s"
-                    params.append(workout_type_name)
-
-                if start_date:
-                    base_query += " AND w.workout_date >= %s"
-                    params.append(start_date)
-                if end_date:
-                    base_query += " AND w.workout_date <= %s"
-                    params.append(end_date)
-
-                base_query += " ORDER BY w.workout_date DESC, w.start_time DESC NULLS LAST;"
-
-                cur.execute(base_query, tuple(params))
-                return cur.fetchall()
-    finally:
-        conn.close()
-def fetch_run_workouts_view(
-    user_id: int,
-    start_date: Optional[date] = None,
-    end_date: Optional[date] = None,
-) -> List[Tuple]:
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                base_query = """
-                    SELECT
-                        workout_id,
-                        workout_date,
-                        start_time,
-                        distance_miles,
-                        duration_seconds,
-                        pace_seconds_per_mile,
-                        elevation_gain_m,
-                        calories_kcal,
-                        avg_heart_rate_bpm,
-                        avg_cadence_spm,
-                        effort_level,
-                        notes
-                    FROM run_workouts
-                    WHERE user_id = %s
+                SELECT
+                    v.week_start,
+                    wt.name AS workout_type,
+                    -- meters -> km
+                    COALESCE(SUM(v.total_distance_m) / 1000.0, 0)::float8 AS total_distance_km,
+                    -- seconds -> whole minutes / hours. SUM(bigint) is numeric,
+                    -- so cast back before dividing to keep integer division
+                    COALESCE(SUM(v.total_duration_sec), 0)::bigint / 60 AS total_duration_min,
+                    (COALESCE(SUM(v.total_duration_sec), 0)::bigint / 60 / 60.0)::float8
+                        AS total_duration_hours
+                FROM weekly_volume v
+                JOIN Workout_Types wt
+                  ON v.workout_type_id = wt.workout_type_id
+                WHERE v.user_id = $1
+                  -- whole weeks overlapping the range
+                  AND v.week_start BETWEEN date_trunc('week', $2::date)::date AND $3
+                GROUP BY v.week_start, wt.name
+                ORDER BY v.week_start ASC, wt.name;
+                """,
+                (user_id, start_date, end_date),
+            )
+            return cur.fetchall()
+
+
+def get_total_distance_per_gear(user_id: int, conn=None) -> Iterator[Tuple]:
+    """
+    Yield (gear_id, gear_type, brand, model, total_distance_km) rows,
+    streamed from a server-side cursor _FETCH_SIZE rows at a time.
+    """
+    with transaction(conn) as conn:
+        with conn.cursor(name="total_distance_per_gear") as cur:
+            cur.itersize = _FETCH_SIZE
+            cur.execute(
                 """
-                params = [user_id]
-
-                if start_date:
-                    base_query += " AND workout_date >= %s"
-                    params.append(start_date)
-                if end_date:
-                    base_query += " AND workout_date <= %s"
-                    params.append(end_date)
-
-                base_query += " ORDER BY workout_date DESC, start_time DESC NULLS LAST;"
-
-                cur.execute(base_query, tuple(params))
-                return cur.fetchall()
-    finally:
-        conn.close()
+                SELECT
+                    gear_id,
+                    gear_type,
+                    brand,
+                    model,
+                    total_distance_km
+                FROM gear_distance
+                WHERE user_id = %s
+                ORDER BY total_distance_m DESC, gear_id;
+                """,
+                (user_id,),
+            )
+            yield from cur
+
+
+def get_gear_distance_display(user_id: int, conn=None) -> List[Tuple]:
+    """Like get_total_distance_per_gear, with the gear label built in SQL."""
+    with read_only(conn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT
+                    gear_id,
+                    trim(
+                        gear_type || ' - '
+                        || COALESCE(brand, '') || ' '
+                        || COALESCE(model, '')
+                    ) AS gear,
+                    total_distance_km
+                FROM gear_distance
+                WHERE user_id = %s
+                ORDER BY total_distance_m DESC, gear_id;
+                """,
+                (user_id,),
+            )
+            return cur.fetchall()
 
 
-def fetch_bike_workouts_view(
+def fetch_workouts(
     user_id: int,
+    workout_type_name: Optional[str] = None,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-) -> List[Tuple]:
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                base_query = """
-                    SELECT
-                        workout_id,
-                        workout_date,
-                        start_time,
-                        distance_miles,
-                        duration_seconds,
-                        speed_mph,
-                        elevation_gain_m,
-                        calories_kcal,
-                        avg_heart_rate_bpm,
-                        avg_cadence_rpm,
-                        avg_power_w,
-                        effort_level,
-                        notes
-                    FROM bike_workouts
-                    WHERE user_id = %s
+    conn=None,
+) -> Dict[str, list]:
+    if workout_type_name == "All":
+        workout_type_name = None
+
+    with read_only(conn) as conn:
+        with conn.cursor() as cur:
+            # One statement shape for every filter combination: missing
+            # filters are passed as NULL, so a single prepared plan serves all
+            execute_prepared(
+                cur,
+                "fetch_workouts",
                 """
-                params = [user_id]
-
-                if start_date:
-                    base_query += " AND workout_date >= %s"
-                    params.append(start_date)
-                if end_date:
-                    base_query += " AND workout_date <= %s"
-                    params.append(end_date)
-
-                base_query += " ORDER BY workout_date DESC, start_time DESC NULLS LAST;"
-
-                cur.execute(base_query, tuple(params))
-                return cur.fetchall()
-    finally:
-        conn.close()
-
-
-def fetch_swim_workouts_view(
+                SELECT
+                    w.workout_date,
+                    w.start_time,
+                    wt.name AS workout_type,
+                    w.distance_km,
+                    w.duration_seconds / 60 AS duration_min,
+                    w.effort_level,
+                    w.notes
+                FROM Workouts w
+                JOIN Workout_Types wt
+                  ON w.workout_type_id = wt.workout_type_id
+                WHERE w.user_id = $1
+                  AND ($2::text IS NULL OR wt.name = $2)
+                  AND w.workout_date BETWEEN COALESCE($3, '-infinity'::date)
+                                         AND COALESCE($4, 'infinity'::date)
+                ORDER BY w.workout_date DESC, w.start_time DESC NULLS LAST
+                """,
+                (user_id, workout_type_name, start_date, end_date),
+            )
+            return _fetch_columns(cur)
+
+
+# Sport-specific history views and the columns shown for each. Only these
+# names are ever interpolated into SQL.
+_SPORT_VIEWS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "run": (
+        "run_workouts",
+        (
+            "workout_date",
+            "start_time",
+            "distance_miles",
+            "duration_seconds / 60 AS duration_min",
+            "pace_seconds_per_mile",
+            "elevation_gain_m",
+            "avg_heart_rate_bpm",
+            "avg_cadence_spm",
+            "effort_level",
+            "notes",
+        ),
+    ),
+    "bike": (
+        "bike_workouts",
+        (
+            "workout_date",
+            "start_time",
+            "distance_miles",
+            "duration_seconds / 60 AS duration_min",
+            "speed_mph",
+            "elevation_gain_m",
+            "avg_heart_rate_bpm",
+            "avg_cadence_rpm",
+            "avg_power_w",
+            "effort_level",
+            "notes",
+        ),
+    ),
+    "swim": (
+        "swim_workouts",
+        (
+            "workout_date",
+            "start_time",
+            "distance_yards",
+            "duration_seconds / 60 AS duration_min",
+            "pace_seconds_per_100yd",
+            "avg_heart_rate_bpm",
+            "effort_level",
+            "notes",
+        ),
+    ),
+}
+
+# One statement per sport, built once at import
+_SPORT_VIEW_SQL: Dict[str, str] = {
+    sport: f"""
+        SELECT {", ".join(columns)}
+        FROM {view}
+        WHERE user_id = $1
+          AND workout_date BETWEEN COALESCE($2, '-infinity'::date)
+                               AND COALESCE($3, 'infinity'::date)
+        ORDER BY workout_date DESC, start_time DESC NULLS LAST
+    """
+    for sport, (view, columns) in _SPORT_VIEWS.items()
+}
+
+
+def fetch_sport_view(
+    sport: str,
     user_id: int,
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
-) -> List[Tuple]:
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                base_query = """
-                    SELECT
-                        workout_id,
-                        workout_date,
-                        start_time,
-                        distance_yards,
-                        duration_seconds,
-                        pace_seconds_per_100yd,
-                        calories_kcal,
-                        avg_heart_rate_bpm,
-                        effort_level,
-                        notes
-                    FROM swim_workouts
-                    WHERE user_id = %s
-                """
-                params = [user_id]
-
-                if start_date:
-                    base_query += " AND workout_date >= %s"
-                    params.append(start_date)
-                if end_date:
-                    base_query += " AND workout_date <= %s"
-                    params.append(end_date)
-
-                base_query += " ORDER BY workout_date DESC, start_time DESC NULLS LAST;"
-
-                cur.execute(base_query, tuple(params))
-                return cur.fetchall()
-    finally:
-        conn.close()
+    conn=None,
+) -> Dict[str, list]:
+    """
+    Workouts for one sport ('run', 'bike' or 'swim') from its view, newest
+    first, as {column name: values}.
+    """
+    sql = _SPORT_VIEW_SQL.get(sport)
+    if sql is None:
+        raise ValueError(f"Unknown sport: {sport}")
+
+    with read_only(conn) as conn:
+        with conn.cursor() as cur:
+            execute_prepared(
+                cur,
+                f"fetch_{sport}_workouts",
+                sql,
+                (user_id, start_date, end_date),
+            )
+            return _fetch_columns(cur)
 
 # ---------- Gear operations ----------
 
@@ -409,48 +507,101 @@ def insert_gear(
     model: Optional[str] = None,
     purchase_date: Optional[date] = None,
     retired: bool = False,
+    conn=None,
 ) -> int:
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO Gear (
-                        user_id,
-                        gear_type,
-                        brand,
-                        model,
-                        purchase_date,
-                        retired
-                    )
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                    RETURNING gear_id;
-                    """,
-                    (user_id, gear_type, brand, model, purchase_date, retired),
+    with transaction(conn) as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                INSERT INTO Gear (
+                    user_id,
+                    gear_type,
+                    brand,
+                    model,
+                    purchase_date,
+                    retired
+                )
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING gear_id;
+                """,
+                (user_id, gear_type, brand, model, purchase_date, retired),
+            )
+            gear_id = cur.fetchone()[0]
+            return gear_id
+
+
+def insert_gear_bulk(rows: List[Tuple], conn=None) -> List[int]:
+    """
+    Insert many (user_id, gear_type, brand, model, purchase_date, retired)
+    rows in one statement. Returns the new gear_ids in input order.
+    """
+    if not rows:
+        return []
+
+    with transaction(conn) as conn:
+        with conn.cursor() as cur:
+            returned = psycopg2.extras.execute_values(
+                cur,
+                """
+                INSERT INTO Gear (
+                    user_id,
+                    gear_type,
+                    brand,
+                    model,
+                    purchase_date,
+                    retired
                 )
-                gear_id = cur.fetchone()[0]
-                return gear_id
-    finally:
-        conn.close()
+                VALUES %s
+                RETURNING gear_id;
+                """,
+                rows,
+                page_size=len(rows),
+                fetch=True,
+            )
+            return [r[0] for r in returned]
+
+
+def _insert_workout_gear_pairs(cur, pairs: List[Tuple[int, int]]) -> None:
+    psycopg2.extras.execute_values(
+        cur,
+        """
+        INSERT INTO Workout_Gear (workout_id, gear_id)
+        VALUES %s
+        ON CONFLICT DO NOTHING;
+        """,
+        pairs,
+        page_size=1000,
+    )
+
+
+def _insert_workout_gear(cur, workout_id: int, gear_ids: Optional[list[int]]) -> None:
+    if not gear_ids:
+        return
+    # All of one workout's gear in a single statement, ids passed as one array
+    cur.execute(
+        """
+        INSERT INTO Workout_Gear (workout_id, gear_id)
+        SELECT %s, gid FROM unnest(%s::int[]) AS gid
+        ON CONFLICT DO NOTHING;
+        """,
+        (workout_id, list(set(gear_ids))),
+    )
+
+
+def attach_gear_to_workout(workout_id: int, gear_ids: list[int], conn=None) -> None:
+    if not gear_ids:
+        return
 
+    with transaction(conn) as conn:
+        with conn.cursor() as cur:
+            _insert_workout_gear(cur, workout_id, gear_ids)
 
-def attach_gear_to_workout(workout_id: int, gear_ids: list[int]) -> None:
-    if not gear_ids:
+
+def attach_gear_to_workouts_bulk(pairs: List[Tuple[int, int]], conn=None) -> None:
+    """Insert (workout_id, gear_id) pairs spanning many workouts at once."""
+    if not pairs:
         return
 
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                for gid in set(gear_ids):
-                    cur.execute(
-                        """
-                        INSERT INTO Workout_Gear (workout_id, gear_id)
-                        VALUES (%s, %s)
-                        ON CONFLICT DO NOTHING;
-                        """,
-                        (workout_id, gid),
-                    )
-    finally:
-        conn.close()
+    with transaction(conn) as conn:
+        with conn.cursor() as cur:
+            _insert_workout_gear_pairs(cur, pairs)
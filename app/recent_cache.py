@@ -0,0 +1,35 @@
+import threading
+import time
+from typing import Optional
+
+# Recent workouts by (username, limit) -> (expires_at, rows). Repeat lookups
+# within _CACHE_TTL seconds skip the database entirely. Readers run on worker
+# threads, so every access goes through _cache_lock.
+_CACHE_TTL = 15.0
+_CACHE_MAX_ENTRIES = 1024
+_recent_cache: dict[tuple[str, int], tuple[float, list]] = {}
+_cache_lock = threading.Lock()
+
+
+def get_cached(username: str, limit: int) -> Optional[list]:
+    """Cached rows for (username, limit), or None if missing or expired."""
+    with _cache_lock:
+        cached = _recent_cache.get((username, limit))
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    return None
+
+
+def store(username: str, limit: int, rows: list) -> None:
+    """Remember rows for (username, limit) for the next _CACHE_TTL seconds."""
+    with _cache_lock:
+        if len(_recent_cache) >= _CACHE_MAX_ENTRIES:
+            _recent_cache.clear()
+        _recent_cache[(username, limit)] = (time.monotonic() + _CACHE_TTL, rows)
+
+
+def invalidate_recent_workouts(username: str) -> None:
+    """Forget cached results for username; call after writing its workouts."""
+    with _cache_lock:
+        for key in [key for key in _recent_cache if key[0] == username]:
+            del _recent_cache[key]
@@ -1,90 +1,127 @@
+from datetime import date, time
+
+from psycopg2.extras import execute_values
+
 from db import get_connection
+from recent_cache import invalidate_recent_workouts
 
+# (username, email, password_hash)
+DEMO_USERS = [
+    ("cam", "cam@example.com", "fake_hash"),
+]
 
-def seed_demo_user_and_workout():
-    conn = get_connection()
-    try:
-        with conn:
+# (username, workout_type, start_time, duration_seconds, distance_m,
+#  elevation_gain_m, calories_kcal, avg_heart_rate_bpm, avg_cadence,
+#  avg_power_w, effort_level, notes)
+DEMO_WORKOUTS = [
+    # 10 km run in meters, 50 m climb, 600 kcal (example), no power
+    ("cam", "run", time(7, 30), 3600, 10000.0, 50.0, 600, 140, 170.0, None, 7,
+     "Easy morning run from Python"),
+]
+
+_DEMO_LOCATION = ("Case Track", "track")
+
+# The no-op DO UPDATEs make RETURNING include rows that already existed, so
+# no follow-up SELECT is needed; xmax = 0 only for a freshly inserted row.
+_SQL_UPSERT_USERS = """
+    INSERT INTO Users (username, email, password_hash)
+    VALUES %s
+    ON CONFLICT (username) DO UPDATE SET username = EXCLUDED.username
+    RETURNING user_id, username, (xmax = 0) AS created;
+"""
+
+_SQL_UPSERT_LOCATION = """
+    INSERT INTO Locations (name, location_type, city, state)
+    VALUES (%s, %s, 'Cleveland', 'OH')
+    ON CONFLICT (name, location_type)
+        DO UPDATE SET name = EXCLUDED.name
+    RETURNING location_id, (xmax = 0) AS created;
+"""
+
+_SQL_INSERT_WORKOUTS = """
+    INSERT INTO Workouts (
+        user_id, workout_type_id, location_id,
+        workout_date, start_time,
+        duration_seconds, distance_m,
+        elevation_gain_m, calories_kcal,
+        avg_heart_rate_bpm, avg_cadence, avg_power_w,
+        effort_level, notes
+    ) VALUES %s
+    RETURNING workout_id, user_id;
+"""
+
+# Per-row template for _SQL_INSERT_WORKOUTS: the workout type is resolved by
+# name inside the INSERT
+_WORKOUT_TEMPLATE = """(
+    %s, (SELECT workout_type_id FROM Workout_Types WHERE name = %s), %s,
+    %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s
+)"""
+
+# Location ids by (name, location_type), remembered once committed
+_location_ids: dict[tuple[str, str], int] = {}
+
+
+def seed_demo(users, workouts):
+    """
+    Insert the given users (skipping ones that already exist) and their
+    workouts at 'Case Track', dated today. Users and workouts each go in as
+    one multi-row INSERT.
+
+    The user and location upserts are idempotent and autocommit on their
+    own, so their row locks are released right away; only the workouts
+    INSERT runs in an explicit transaction.
+    """
+    with get_connection() as conn:
+        conn.autocommit = True
+        try:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO Users (username, email, password_hash)
-                    VALUES ('cam', 'cam@example.com', 'fake_hash')
-                    ON CONFLICT (username) DO NOTHING
-                    RETURNING user_id;
-                    """
-                )
-                row = cur.fetchone()
-                if row:
-                    user_id = row[0]
-                    print(f"Inserted new user 'cam' with user_id={user_id}")
-                else:
-                    cur.execute(
-                        "SELECT user_id FROM Users WHERE username = 'cam';"
-                    )
-                    user_id = cur.fetchone()[0]
-                    print(f"User 'cam' already exists with user_id={user_id}")
-
-                cur.execute(
-                    """
-                    SELECT location_id
-                    FROM Locations
-                    WHERE name = 'Case Track' AND location_type = 'track'
-                    LIMIT 1;
-                    """
-                )
-                loc_row = cur.fetchone()
-                if loc_row:
-                    location_id = loc_row[0]
-                    print(
-                        f"Location 'Case Track' already exists with location_id={location_id}"
-                    )
-                else:
-                    cur.execute(
-                        """
-                        INSERT INTO Locations (name, location_type, city, state)
-                        VALUES ('Case Track', 'track', 'Cleveland', 'OH')
-                        RETURNING location_id;
-                        """
-                    )
-                    location_id = cur.fetchone()[0]
-                    print(
-                        f"Inserted location 'Case Track' with location_id={location_id}"
-                    )
+                returned = execute_values(cur, _SQL_UPSERT_USERS, users, fetch=True)
+                user_ids = {}
+                for user_id, username, created in returned:
+                    user_ids[username] = user_id
+                    if created:
+                        print(f"Inserted new user '{username}' with user_id={user_id}")
+                    else:
+                        print(f"User '{username}' already exists with user_id={user_id}")
+
+                location_id = _location_ids.get(_DEMO_LOCATION)
+                if location_id is None:
+                    cur.execute(_SQL_UPSERT_LOCATION, _DEMO_LOCATION)
+                    location_id, created = cur.fetchone()
+                    if created:
+                        print(
+                            f"Inserted location 'Case Track' with location_id={location_id}"
+                        )
+                    else:
+                        print(
+                            f"Location 'Case Track' already exists with location_id={location_id}"
+                        )
+                    # Already committed, so safe to remember
+                    _location_ids[_DEMO_LOCATION] = location_id
 
-                
-                cur.execute(
-                    "SELECT workout_type_id FROM Workout_Types WHERE name = 'run';"
-                )
-                workout_type_id = cur.fetchone()[0]
-
-                
-                cur.execute(
-                    """
-                    INSERT INTO Workouts (
-                        user_id, workout_type_id, location_id,
-                        workout_date, start_time,
-                        duration_seconds, distance_m,
-                        elevation_gain_m, calories_kcal,
-                        avg_heart_rate_bpm, avg_cadence, avg_power_w,
-                        effort_level, gear_id, notes
-                    ) VALUES (
-                        %s, %s, %s,
-                        CURRENT_DATE, '07:30',
-                        3600, 10000.0,              -- 10 km run in meters
-                        50.0, 600,                  -- 50 m climb, 600 kcal (example)
-                        140, 170.0, NULL,           -- avg HR, cadence, no power
-                        7, NULL, 'Easy morning run from Python'
+            today = date.today()
+            rows = [
+                (user_ids[username], workout_type, location_id, today, *rest)
+                for username, workout_type, *rest in workouts
+            ]
+
+            conn.autocommit = False
+            with conn:
+                with conn.cursor() as cur:
+                    inserted = execute_values(
+                        cur, _SQL_INSERT_WORKOUTS, rows, template=_WORKOUT_TEMPLATE, fetch=True
                     )
-                    RETURNING workout_id;
-                    """,
-                    (user_id, workout_type_id, location_id),
-                )
-
-                workout_id = cur.fetchone()[0]
-                print(f"Inserted workout {workout_id} for user {user_id}")
-    finally:
-        conn.close()
+                    for workout_id, user_id in inserted:
+                        print(f"Inserted workout {workout_id} for user {user_id}")
+        finally:
+            conn.autocommit = False
+
+    for username in {w[0] for w in workouts}:
+        invalidate_recent_workouts(username)
+
+
+def seed_demo_user_and_workout():
+    seed_demo(DEMO_USERS, DEMO_WORKOUTS)
 
 
 if __name__ == "__main__":
@@ -1,57 +1,106 @@
-from db import get_connection
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
+import psycopg2.extras
+
+import recent_cache
+from db import POOL_MAX_CONNECTIONS, execute_prepared, get_connection
+
+# Resolve the user, take the top-N straight off workouts_user_date_idx, then
+# join only those rows for the type name. Prepared once per pooled connection.
+_SQL_RECENT_WORKOUTS = """
+    WITH top AS (
+        SELECT
+            workout_type_id, workout_date, start_time,
+            distance_km, duration_seconds, effort_level, notes
+        FROM Workouts
+        WHERE user_id = (SELECT user_id FROM Users WHERE username = $1)
+        ORDER BY workout_date DESC, start_time DESC NULLS LAST
+        LIMIT $2
+    )
+    SELECT
+        t.workout_date,
+        wt.name AS workout_type,
+        t.distance_km,
+        t.duration_seconds / 60 AS duration_min,
+        t.effort_level,
+        t.notes
+    FROM top t
+    JOIN Workout_Types wt USING (workout_type_id)
+    ORDER BY t.workout_date DESC, t.start_time DESC NULLS LAST
+"""
+
+_SQL_USER_EXISTS = "SELECT 1 FROM Users WHERE username = %s;"
 
-def get_recent_workouts(username: str, limit: int = 10):
-    conn = get_connection()
-    try:
-        with conn:
-            with conn.cursor() as cur:
-                # Find the user_id for the given username
-                cur.execute("""
-                    SELECT user_id
-                    FROM Users
-                    WHERE username = %s;
-                """, (username,))
-                user_row = cur.fetchone()
-                if not user_row:
-                    print(f"No such user: {username}")
-                    return []
-
-                user_id = user_row[0]
-
-                # Fetch recent workouts
-                cur.execute("""
-                    SELECT
-                        workout_date,
-                        wt.name AS workout_type,
-                        distance_km,
-                        duration_seconds,
-                        effort_level,
-                        notes
-                    FROM Workouts w
-                    JOIN Workout_Types wt
-                      ON w.workout_type_id = wt.workout_type_id
-                    WHERE w.user_id = %s
-                    ORDER BY workout_date DESC, start_time DESC
-                    LIMIT %s;
-                """, (user_id, limit))
 
+def get_recent_workouts(username: str, limit: int = 10) -> list:
+    """
+    Rows with workout_date, workout_type, distance_km, duration_min,
+    effort_level and notes fields, newest first.
+    """
+    cached = recent_cache.get_cached(username, limit)
+    if cached is not None:
+        return cached
+
+    with get_connection() as conn:
+        with conn:
+            with conn.cursor(cursor_factory=psycopg2.extras.NamedTupleCursor) as cur:
+                # One round trip; see _SQL_RECENT_WORKOUTS
+                execute_prepared(
+                    cur, "recent_workouts_by_username", _SQL_RECENT_WORKOUTS, (username, limit)
+                )
                 rows = cur.fetchall()
-                return rows
-    finally:
-        conn.close()
+
+                if not rows:
+                    # Rare path: tell "no such user" apart from "no workouts"
+                    cur.execute(_SQL_USER_EXISTS, (username,))
+                    if cur.fetchone() is None:
+                        print(f"No such user: {username}")
+                        return rows
+
+    recent_cache.store(username, limit, rows)
+    return rows
+
+
+# Worker threads shared by the batch and async lookups. Each task borrows its
+# own pooled connection, and the pool raises rather than waits when it runs
+# dry, so stay below its maxconn and leave connections for the app's other
+# callers.
+_DB_THREADS = ThreadPoolExecutor(
+    max_workers=POOL_MAX_CONNECTIONS - 2, thread_name_prefix="db"
+)
+
+
+def get_recent_workouts_for_users(usernames: list[str], limit: int = 10):
+    """
+    Recent workouts for several users at once, as {username: rows}. Each
+    lookup runs on a _DB_THREADS worker with its own pooled connection, so
+    the round trips overlap instead of running back to back.
+    """
+    results = _DB_THREADS.map(lambda username: get_recent_workouts(username, limit), usernames)
+    return dict(zip(usernames, results))
+
+
+async def get_recent_workouts_async(username: str, limit: int = 10) -> list:
+    """
+    get_recent_workouts for async handlers: the blocking psycopg2 calls run
+    on a worker thread, so the event loop keeps serving other requests.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _DB_THREADS, get_recent_workouts, username, limit
+    )
 
 
 if __name__ == "__main__":
     workouts = get_recent_workouts("cam", limit=5)
+    if workouts:
+        print("Recent workouts for cam:")
+    for w in workouts:
+        print(
+            f"{w.workout_date} | {w.workout_type:4} | "
+            f"{w.distance_km} km | {w.duration_min} min | "
+            f"effort {w.effort_level} | {w.notes}"
+        )
     if not workouts:
         print("No workouts found.")
-    else:
-        print("Recent workouts for cam:")
-        for w in workouts:
-            workout_date, workout_type, distance_km, duration_seconds, effort_level, notes = w
-            print(
-                f"{workout_date} | {workout_type:4} | "
-                f"{distance_km} km | {duration_seconds//60} min | "
-                f"effort {effort_level} | {notes}"
-            )
@@ -10,6 +10,8 @@ DROP TABLE IF EXISTS Gear;
 DROP TABLE IF EXISTS Locations;
 DROP TABLE IF EXISTS Workout_Types;
 DROP TABLE IF EXISTS Users;
+DROP TABLE IF EXISTS weekly_volume;
+DROP FUNCTION IF EXISTS weekly_volume_apply();
 
 -- ---------- Users ----------
 CREATE TABLE Users (
@@ -43,7 +45,8 @@ CREATE TABLE Locations (
             'other'
         )),
     city          VARCHAR(100),
-    state         VARCHAR(100)
+    state         VARCHAR(100),
+    UNIQUE (name, location_type)
 );
 
 -- ---------- Gear ----------
@@ -77,6 +80,7 @@ CREATE TABLE Workouts (
 
     duration_seconds      INT NOT NULL CHECK (duration_seconds > 0),
     distance_m            NUMERIC(8,2) CHECK (distance_m >= 0),
+    distance_km           DOUBLE PRECISION GENERATED ALWAYS AS (distance_m / 1000.0) STORED,
     elevation_gain_m      NUMERIC(6,2) CHECK (elevation_gain_m >= 0),
     calories_kcal         INT CHECK (calories_kcal >= 0),
 
@@ -104,6 +108,19 @@ CREATE TABLE Workout_Gear (
     PRIMARY KEY (workout_id, gear_id)
 );
 
+-- ---------- Workouts indexes ----------
+-- Recent / history lists: filter by user, newest first. INCLUDE carries the
+-- small fixed-width columns; notes is unbounded TEXT and would push index
+-- rows past the btree size limit, so the LIMIT-ed recent query reads it
+-- from the heap for just those rows.
+CREATE INDEX workouts_user_date_idx
+    ON Workouts (user_id, workout_date DESC, start_time DESC NULLS LAST)
+    INCLUDE (workout_type_id, distance_km, duration_seconds, effort_level);
+
+-- History filtered to one sport
+CREATE INDEX workouts_user_type_date_idx
+    ON Workouts (user_id, workout_type_id, workout_date DESC);
+
 -- ---------- Seed base workout types ----------
 INSERT INTO Workout_Types (name) VALUES ('swim'), ('bike'), ('run')
 ON CONFLICT (name) DO NOTHING;
@@ -208,7 +225,8 @@ SELECT
     g.gear_type,
     g.brand,
     g.model,
-    COALESCE(SUM(w.distance_m), 0) AS total_distance_m
+    COALESCE(SUM(w.distance_m), 0) AS total_distance_m,
+    COALESCE(SUM(w.distance_km), 0) AS total_distance_km
 FROM Gear g
 LEFT JOIN Workout_Gear wg
     ON wg.gear_id = g.gear_id
@@ -216,3 +234,95 @@ LEFT JOIN Workouts w
     ON w.workout_id = wg.workout_id
 GROUP BY
     g.gear_id, g.user_id, g.gear_type, g.brand, g.model;
+
+-- ===========================================================
+--   Weekly volume summary (dashboard)
+-- ===========================================================
+-- Per-user, per-week, per-sport totals so the dashboard reads a handful of
+-- rows instead of re-aggregating Workouts on every load. Kept current by the
+-- statement-level triggers below: each write to Workouts applies its rows as
+-- deltas, touching only the (user, week, sport) rows it affects.
+CREATE TABLE weekly_volume (
+    user_id            INT    NOT NULL,
+    week_start         DATE   NOT NULL,
+    workout_type_id    INT    NOT NULL,
+    total_distance_m   NUMERIC NOT NULL DEFAULT 0,
+    total_duration_sec BIGINT NOT NULL DEFAULT 0,
+    workout_count      INT    NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, week_start, workout_type_id)
+);
+
+CREATE FUNCTION weekly_volume_apply() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        INSERT INTO weekly_volume AS v
+            (user_id, week_start, workout_type_id,
+             total_distance_m, total_duration_sec, workout_count)
+        SELECT
+            user_id,
+            date_trunc('week', workout_date)::date,
+            workout_type_id,
+            -SUM(COALESCE(distance_m, 0)),
+            -SUM(duration_seconds),
+            -COUNT(*)
+        FROM old_rows
+        GROUP BY 1, 2, 3
+        ON CONFLICT (user_id, week_start, workout_type_id) DO UPDATE SET
+            total_distance_m   = v.total_distance_m   + EXCLUDED.total_distance_m,
+            total_duration_sec = v.total_duration_sec + EXCLUDED.total_duration_sec,
+            workout_count      = v.workout_count      + EXCLUDED.workout_count;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO weekly_volume AS v
+            (user_id, week_start, workout_type_id,
+             total_distance_m, total_duration_sec, workout_count)
+        SELECT
+            user_id,
+            date_trunc('week', workout_date)::date,
+            workout_type_id,
+            SUM(COALESCE(distance_m, 0)),
+            SUM(duration_seconds),
+            COUNT(*)
+        FROM new_rows
+        GROUP BY 1, 2, 3
+        ON CONFLICT (user_id, week_start, workout_type_id) DO UPDATE SET
+            total_distance_m   = v.total_distance_m   + EXCLUDED.total_distance_m,
+            total_duration_sec = v.total_duration_sec + EXCLUDED.total_duration_sec,
+            workout_count      = v.workout_count      + EXCLUDED.workout_count;
+    END IF;
+
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        -- Weeks whose last workout went away
+        DELETE FROM weekly_volume v
+        USING (
+            SELECT DISTINCT
+                user_id,
+                date_trunc('week', workout_date)::date AS week_start,
+                workout_type_id
+            FROM old_rows
+        ) o
+        WHERE v.user_id = o.user_id
+          AND v.week_start = o.week_start
+          AND v.workout_type_id = o.workout_type_id
+          AND v.workout_count = 0;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER weekly_volume_ins
+    AFTER INSERT ON Workouts
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION weekly_volume_apply();
+
+CREATE TRIGGER weekly_volume_upd
+    AFTER UPDATE ON Workouts
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION weekly_volume_apply();
+
+CREATE TRIGGER weekly_volume_del
+    AFTER DELETE ON Workouts
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION weekly_volume_apply();